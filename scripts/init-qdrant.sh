@@ -16,15 +16,12 @@ echo "Cleaning up existing collections..."
 curl -X DELETE "http://qdrant:6333/collections/exact_cache" 2>/dev/null || true
 curl -X DELETE "http://qdrant:6333/collections/litellm_semantic_cache" 2>/dev/null || true
 
-# Create exact_cache collection for API (dimension 384 for all-MiniLM-L6-v2)
-echo "Creating exact_cache collection with 384 dimensions..."
+# Create exact_cache collection for API (payload-only, lookups are by point ID)
+echo "Creating exact_cache collection without vectors..."
 curl -X PUT "http://qdrant:6333/collections/exact_cache" \
   -H "Content-Type: application/json" \
   -d '{
-    "vectors": {
-      "size": 384,
-      "distance": "Cosine"
-    }
+    "vectors": {}
   }'
 
 # Create litellm_semantic_cache collection (dimension 384 for all-MiniLM-L6-v2)
@@ -6,7 +6,11 @@ Ensures required experiments exist before services start.
 
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
+import httpx
 import mlflow
+from mlflow.exceptions import MlflowException
+from mlflow.protos.databricks_pb2 import RESOURCE_ALREADY_EXISTS, ErrorCode
 from mlflow.tracking import MlflowClient
 import logging
 
@@ -14,42 +18,47 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def wait_for_mlflow(max_retries=30, delay=2):
-    """Wait for MLflow server to be available."""
+def wait_for_mlflow(max_retries=30, initial_delay=0.1, max_delay=5):
+    """Wait for MLflow server to be available (exponential backoff on /health)."""
     mlflow_uri = os.getenv("MLFLOW_TRACKING_URI", "http://mlflow:5000")
     mlflow.set_tracking_uri(mlflow_uri)
     
+    delay = initial_delay
     for attempt in range(max_retries):
         try:
-            client = MlflowClient()
-            # Try to list experiments to test connectivity
-            client.search_experiments()
+            # Lightweight liveness probe instead of listing experiments
+            httpx.head(f"{mlflow_uri}/health", timeout=1).raise_for_status()
             logger.info(f"✅ MLflow server is available at {mlflow_uri}")
-            return client
+            return MlflowClient()
         except Exception as e:
             if attempt < max_retries - 1:
                 logger.info(f"⏳ Waiting for MLflow server... (attempt {attempt + 1}/{max_retries})")
                 time.sleep(delay)
+                delay = min(delay * 2, max_delay)
             else:
                 logger.error(f"❌ Failed to connect to MLflow after {max_retries} attempts: {e}")
                 raise
 
-def create_experiment_if_not_exists(client, experiment_name):
-    """Create experiment if it doesn't exist."""
-    try:
-        # Try to get existing experiment
-        experiment = mlflow.get_experiment_by_name(experiment_name)
-        if experiment:
-            logger.info(f"✅ Experiment '{experiment_name}' already exists (ID: {experiment.experiment_id})")
-            return experiment.experiment_id
-    except Exception:
-        pass
+def create_experiment_if_not_exists(existing, experiment_name):
+    """Create experiment if it isn't in the prefetched name -> ID mapping."""
+    if experiment_name in existing:
+        experiment_id = existing[experiment_name]
+        logger.info(f"✅ Experiment '{experiment_name}' already exists (ID: {experiment_id})")
+        return experiment_id
     
     # Create new experiment
     try:
         experiment_id = mlflow.create_experiment(experiment_name)
         logger.info(f"🆕 Created experiment '{experiment_name}' (ID: {experiment_id})")
         return experiment_id
+    except MlflowException as e:
+        # Another init container created it between our check and create
+        if e.error_code == ErrorCode.Name(RESOURCE_ALREADY_EXISTS):
+            experiment = mlflow.get_experiment_by_name(experiment_name)
+            logger.info(f"✅ Experiment '{experiment_name}' was created concurrently (ID: {experiment.experiment_id})")
+            return experiment.experiment_id
+        logger.error(f"❌ Failed to create experiment '{experiment_name}': {e}")
+        raise
     except Exception as e:
         logger.error(f"❌ Failed to create experiment '{experiment_name}': {e}")
         raise
@@ -67,11 +76,15 @@ def main():
         "llmops-litellm-security"    # For direct LiteLLM proxy calls
     ]
     
-    # Create experiments
-    created_experiments = {}
-    for exp_name in experiments:
-        exp_id = create_experiment_if_not_exists(client, exp_name)
-        created_experiments[exp_name] = exp_id
+    # List existing experiments once; only missing names cost an RPC
+    existing = {exp.name: exp.experiment_id for exp in client.search_experiments()}
+    
+    # Create missing experiments concurrently (I/O bound, one RTT overall)
+    with ThreadPoolExecutor(max_workers=min(8, len(experiments))) as executor:
+        exp_ids = executor.map(
+            lambda name: create_experiment_if_not_exists(existing, name), experiments
+        )
+        created_experiments = dict(zip(experiments, exp_ids))
     
     # Verify all experiments exist
     logger.info("📋 Verifying experiments:")
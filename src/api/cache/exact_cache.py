@@ -1,28 +1,50 @@
 """
 Exact Cache Implementation
 
-This module provides exact cache functionality using MD5 hashing for fast lookup
-of identical prompts. It's designed to be lightweight and fast, handling only
+This module provides exact cache functionality using xxHash (XXH128) hashing for
+fast lookup of identical prompts. It's designed to be lightweight and fast, handling only
 exact matches (similarity = 1.0).
 
 The cache uses Qdrant as the storage backend but with a simplified approach:
-- Uses MD5 hash of the prompt as the cache key
+- Uses the XXH128 hash of the prompt as the cache key (non-cryptographic, the
+  key is only used for lookups; its 32 hex chars are accepted as a Qdrant UUID)
 - Stores exact responses with metadata
+- Writes are queued and upserted to Qdrant in batches by a background task
+- Expired entries are filtered out server-side and purged periodically
 - No embedding computation needed
 """
 
-import hashlib
+import asyncio
 import json
 import time
 import logging
-from typing import Dict, Any, Optional, Tuple
-from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance, PointStruct
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+import xxhash
+from cachetools import TLRUCache
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import (
+    FieldCondition,
+    Filter,
+    FilterSelector,
+    HasIdCondition,
+    PayloadSchemaType,
+    PointStruct,
+    Range,
+)
 
 logger = logging.getLogger(__name__)
 
-# Vector dimensions to match TEI embedding model (all-MiniLM-L6-v2)
-VECTOR_DIMENSIONS = 384
+# Max entries kept in the in-process front cache
+LOCAL_CACHE_SIZE = 4096
+
+# Background writer: flush queued points every interval, or earlier once a batch is full
+FLUSH_INTERVAL_SECONDS = 0.05
+FLUSH_BATCH_SIZE = 32
+
+# How often the background writer bulk-deletes expired entries
+PURGE_INTERVAL_SECONDS = 60
 
 
 class ExactCache:
@@ -32,78 +54,185 @@ class ExactCache:
         self,
         qdrant_url: str = "http://localhost:6333",
         ttl_seconds: int = 1800,
+        grpc_port: int = 6334,
     ):
-        self.qdrant_client = QdrantClient(url=qdrant_url)
+        # gRPC keeps a persistent multiplexed HTTP/2 channel to Qdrant
+        self.qdrant_client = AsyncQdrantClient(
+            url=qdrant_url,
+            prefer_grpc=True,
+            grpc_port=grpc_port,
+            timeout=5
+        )
         self.ttl = ttl_seconds
         self.collection_name = "exact_cache"
-        self._init_collection()
+        # In-process front cache to skip the Qdrant round-trip for hot prompts.
+        # Values are (expires_at, response): each entry expires when its Qdrant
+        # point does, not ttl after it was copied here
+        self._local = TLRUCache(
+            maxsize=LOCAL_CACHE_SIZE,
+            ttu=lambda _key, value, _now: value[0],
+            timer=time.time,
+        )
+        self._local_lock = threading.Lock()
+        # Points waiting to be upserted by the background writer
+        self._pending: List[PointStruct] = []
+        self._pending_lock = threading.Lock()
+        self._flush_requested = asyncio.Event()
+        self._writer_task: Optional[asyncio.Task] = None
+        self._closing = False
     
-    def _init_collection(self):
+    async def _init_collection(self):
         """Initialize Qdrant collection for exact cache"""
         try:
             # Check if collection exists
-            collections = self.qdrant_client.get_collections()
+            collections = await self.qdrant_client.get_collections()
             collection_names = [c.name for c in collections.collections]
             
             if self.collection_name not in collection_names:
-                # Create collection with dimensions matching the TEI embedding model (all-MiniLM-L6-v2)
-                self.qdrant_client.create_collection(
+                # Lookups are by point ID only, so the collection stores payloads without vectors
+                await self.qdrant_client.create_collection(
                     collection_name=self.collection_name,
-                    vectors_config=VectorParams(
-                        size=VECTOR_DIMENSIONS,  # Match TEI embedding dimensions for all-MiniLM-L6-v2
-                        distance=Distance.COSINE
-                    )
+                    vectors_config={}
                 )
                 logger.info(f"Created exact cache collection: {self.collection_name}")
+            
+            # Index the timestamp so TTL filters and purges don't scan payloads
+            await self.qdrant_client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name="timestamp",
+                field_schema=PayloadSchemaType.FLOAT
+            )
         except Exception as e:
             logger.error(f"Failed to initialize exact cache collection: {e}")
             raise
     
-    def _hash_prompt(self, prompt: str, model: str, **kwargs) -> str:
-        """Create MD5 hash of prompt, model and parameters"""
-        # Create a consistent hash key
-        hash_data = f"{prompt}|{model}"
+    async def start(self):
+        """Create the collection if needed and start the background writer"""
+        await self._init_collection()
+        if self._writer_task is None:
+            self._closing = False
+            self._writer_task = asyncio.create_task(self._writer_loop())
+    
+    async def close(self):
+        """Stop the background writer, flush queued writes and close Qdrant clients"""
+        if self._writer_task is not None:
+            self._closing = True
+            self._flush_requested.set()
+            await self._writer_task
+            self._writer_task = None
+        await self._flush()
+        await self.qdrant_client.close()
+    
+    async def _writer_loop(self):
+        """Flush queued points every FLUSH_INTERVAL_SECONDS or when a batch is full"""
+        next_purge = time.monotonic() + PURGE_INTERVAL_SECONDS
+        while not self._closing:
+            try:
+                await asyncio.wait_for(
+                    self._flush_requested.wait(), timeout=FLUSH_INTERVAL_SECONDS
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self._flush()
+            if time.monotonic() >= next_purge:
+                next_purge = time.monotonic() + PURGE_INTERVAL_SECONDS
+                await self._purge_expired()
+    
+    async def _flush(self):
+        """Upsert all queued points in a single request"""
+        with self._pending_lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return
+        try:
+            await self.qdrant_client.upsert(
+                collection_name=self.collection_name,
+                points=batch,
+                wait=False
+            )
+        except Exception as e:
+            logger.error(f"Error flushing {len(batch)} exact cache entries: {e}")
+    
+    async def _purge_expired(self):
+        """Bulk delete entries older than the TTL"""
+        try:
+            await self.qdrant_client.delete(
+                collection_name=self.collection_name,
+                points_selector=FilterSelector(
+                    filter=Filter(must=[
+                        FieldCondition(key="timestamp", range=Range(lt=time.time() - self.ttl))
+                    ])
+                ),
+                wait=False
+            )
+        except Exception as e:
+            logger.error(f"Error purging expired exact cache entries: {e}")
+    
+    def make_key(self, prompt: str, model: str, **kwargs) -> str:
+        """Create the cache key: XXH128 hash of prompt, model and parameters"""
+        # Feed the fields to an incremental hasher instead of building one big string
+        h = xxhash.xxh128()
+        h.update(prompt.encode())
+        h.update(b"|")
+        h.update(model.encode())
+        if not kwargs:
+            return h.hexdigest()
         for key, value in sorted(kwargs.items()):
-            hash_data += f"|{key}:{value}"
-        return hashlib.md5(hash_data.encode()).hexdigest()
+            h.update(b"|")
+            h.update(key.encode())
+            h.update(b":")
+            h.update(repr(value).encode())
+        return h.hexdigest()
     
-    def _is_expired(self, timestamp: float) -> bool:
-        """Check if cache entry is expired"""
-        return time.time() - timestamp > self.ttl
+    def get_local(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Cached response for a make_key() key from the in-process front cache
+        only, without the Qdrant lookup. Returns response dict or None
+        """
+        with self._local_lock:
+            local_entry = self._local.get(key)
+        return local_entry[1] if local_entry is not None else None
     
-    def get(self, prompt: str, model: str, **kwargs) -> Optional[Dict[str, Any]]:
+    async def get(
+        self, prompt: str, model: str, key: Optional[str] = None, **kwargs
+    ) -> Optional[Dict[str, Any]]:
         """
         Get cached response for exact prompt match
         Returns response dict or None
+
+        key: precomputed make_key(prompt, model, **kwargs), if the caller has it
         """
         try:
             # Create hash key
-            cache_key = self._hash_prompt(prompt, model, **kwargs)
+            cache_key = key if key is not None else self.make_key(prompt, model, **kwargs)
+            
+            # Check the in-process front cache first
+            local_response = self.get_local(cache_key)
+            if local_response is not None:
+                return local_response
             
-            # Try to retrieve from Qdrant
-            result = self.qdrant_client.retrieve(
+            # Try to retrieve from Qdrant, letting the server drop expired entries
+            result, _ = await self.qdrant_client.scroll(
                 collection_name=self.collection_name,
-                ids=[cache_key]
+                scroll_filter=Filter(must=[
+                    HasIdCondition(has_id=[cache_key]),
+                    FieldCondition(key="timestamp", range=Range(gte=time.time() - self.ttl))
+                ]),
+                limit=1,
+                with_payload=True,
+                with_vectors=False
             )
             
             if result:
                 payload = result[0].payload
                 
-                # Check TTL
-                if self._is_expired(payload.get("timestamp", 0)):
-                    # Delete expired entry
-                    self.qdrant_client.delete(
-                        collection_name=self.collection_name,
-                        points_selector=[cache_key]
-                    )
-                    return None
-                
-                # Check model compatibility
-                if payload.get("model") != model:
-                    return None
-                
                 logger.info(f"Exact cache hit for prompt: {prompt[:50]}...")
-                return payload.get("response")
+                response = payload.get("response")
+                # Only for the rest of the entry's lifetime (timestamp is when it was written)
+                with self._local_lock:
+                    self._local[cache_key] = (payload["timestamp"] + self.ttl, response)
+                return response
             
             return None
             
@@ -111,54 +240,70 @@ class ExactCache:
             logger.error(f"Error getting exact cache: {e}")
             return None
     
-    def set(self, prompt: str, model: str, response: Dict[str, Any], **kwargs) -> bool:
+    def set(
+        self,
+        prompt: str,
+        model: str,
+        response: Dict[str, Any],
+        key: Optional[str] = None,
+        **kwargs,
+    ) -> bool:
         """
-        Store response in exact cache
+        Store response in exact cache.
+        
+        The point is queued and written to Qdrant by the background writer,
+        so this never blocks on the network. key is the precomputed
+        make_key(prompt, model, **kwargs), if the caller has it.
         """
         try:
             # Create hash key
-            cache_key = self._hash_prompt(prompt, model, **kwargs)
+            cache_key = key if key is not None else self.make_key(prompt, model, **kwargs)
             
-            # Create point with zero vector to match collection configuration
+            # Payload-only point (the collection has no vectors configured).
+            # Prompt, model and parameters are not stored: the key already encodes them.
+            now = time.time()
             point = PointStruct(
                 id=cache_key,
-                vector=[0.0] * VECTOR_DIMENSIONS,  # Zero vector matching TEI embedding dimensions
+                vector={},
                 payload={
-                    "prompt": prompt,
-                    "model": model,
                     "response": response,
-                    "timestamp": time.time(),
-                    "parameters": kwargs
+                    "timestamp": now
                 }
             )
             
-            # Store in Qdrant
-            self.qdrant_client.upsert(
-                collection_name=self.collection_name,
-                points=[point]
-            )
+            with self._local_lock:
+                self._local[cache_key] = (now + self.ttl, response)
+            
+            # Queue for the next batched upsert
+            with self._pending_lock:
+                self._pending.append(point)
+                pending_count = len(self._pending)
+            if pending_count >= FLUSH_BATCH_SIZE:
+                self._flush_requested.set()
             
-            logger.info(f"Stored exact cache for prompt: {prompt[:50]}...")
+            logger.info(f"Queued exact cache for prompt: {prompt[:50]}...")
             return True
             
         except Exception as e:
             logger.error(f"Error setting exact cache: {e}")
             return False
     
-    def clear(self) -> bool:
+    async def clear(self) -> bool:
         """
         Clear exact cache collection
         """
         try:
-            self.qdrant_client.delete_collection(self.collection_name)
+            await self.qdrant_client.delete_collection(self.collection_name)
+            with self._local_lock:
+                self._local.clear()
             logger.info(f"Cleared exact cache collection: {self.collection_name}")
-            self._init_collection()
+            await self._init_collection()
             return True
         except Exception as e:
             logger.error(f"Error clearing exact cache: {e}")
             return False
     
-    def clear_cache(self, cache_type: str = "all") -> bool:
+    async def clear_cache(self, cache_type: str = "all") -> bool:
         """
         Clear cache collections.
         
@@ -171,9 +316,11 @@ class ExactCache:
         """
         try:
             if cache_type in ["exact", "all"]:
-                self.qdrant_client.delete_collection(self.collection_name)
+                await self.qdrant_client.delete_collection(self.collection_name)
+                with self._local_lock:
+                    self._local.clear()
                 logger.info(f"Cleared exact cache collection: {self.collection_name}")
-                self._init_collection()
+                await self._init_collection()
                 return True
             elif cache_type == "semantic":
                 # For semantic cache, we don't manage it here
@@ -186,7 +333,7 @@ class ExactCache:
             logger.error(f"Error clearing cache: {e}")
             return False
     
-    def get_cache_stats(self) -> Dict[str, Any]:
+    async def get_cache_stats(self) -> Dict[str, Any]:
         """
         Get cache statistics from Qdrant collection.
         
@@ -195,7 +342,7 @@ class ExactCache:
         """
         try:
             # Get collection info from Qdrant
-            collection_info = self.qdrant_client.get_collection(self.collection_name)
+            collection_info = await self.qdrant_client.get_collection(self.collection_name)
             
             # Handle both old and new Qdrant client API versions
             # In newer versions, vectors_count is in collection_info.points_count
@@ -212,7 +359,6 @@ class ExactCache:
                 "vectors_count": vectors_count,
                 "indexed_vectors_count": indexed_vectors_count, 
                 "points_count": collection_info.points_count,
-                "vector_dimensions": VECTOR_DIMENSIONS,
                 "ttl_seconds": self.ttl
             }
         except Exception as e:
@@ -1,22 +1,68 @@
 """Application factory for creating FastAPI instances."""
 
+import time
+
+import orjson
 from fastapi import FastAPI
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from middleware.metrics import metrics_middleware
-from middleware.request_id import request_id_middleware
-from middleware.request_limits import request_limits_middleware
-from middleware.security import security_middleware
-from middleware.shutdown import shutdown_middleware
+from fastapi.responses import ORJSONResponse, Response
+from middleware.metrics import MetricsMiddleware
+from middleware.probes import ProbeBypassMiddleware
+from middleware.request_info import RequestInfoMiddleware
+from middleware.request_id import RequestIDMiddleware
+from middleware.request_limits import RequestLimitsMiddleware
+from middleware.security import SecurityMiddleware
+from middleware.shutdown import ShutdownMiddleware
 from routers.auth import router as auth_router
 from routers.llm import router as llm_router
 from routers.monitoring import router as monitoring_router
 from routers.system import router as system_router
-from utils.exceptions import validation_exception_handler
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.middleware.exceptions import ExceptionMiddleware
+from utils.exceptions import http_exception_handler, validation_exception_handler
 
 from config.lifespan import lifespan
 from config.settings import settings
 
+# Static parts of the root and liveness payloads, serialized once.
+# Only the trailing timestamp changes, and at most once per second.
+_ROOT_BODY_PREFIX = orjson.dumps(
+    {
+        "message": "LLMOps Secure API is running!",
+        "version": settings.API_VERSION,
+        "docs": "/docs",
+        "redoc": "/redoc",
+        "health": "/health",
+        "health_detailed": "/health/detailed",
+    }
+)[:-1] + b',"timestamp":'
+_HEALTH_BODY_PREFIX = b'{"status":"alive","timestamp":'
+# Timestamp and bodies for the current second, all derived from one time read
+_second_cache = {"second": -1, "iso": "", "root": b"", "health": b""}
+
+
+def _now_iso(second: int) -> str:
+    """UTC time of an epoch second in ISO 8601 ("...Z")."""
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(second))
+
+
+def _cached_bodies() -> dict:
+    """Return the timestamp and root/liveness JSON bodies for the current second.
+
+    Rebuilt at most once per second; "iso", "root" and "health" always
+    belong to the same second.
+    """
+    second = int(time.time())
+    if second != _second_cache["second"]:
+        iso = _now_iso(second)
+        timestamp = orjson.dumps(iso)
+        _second_cache["iso"] = iso
+        _second_cache["root"] = _ROOT_BODY_PREFIX + timestamp + b"}"
+        _second_cache["health"] = _HEALTH_BODY_PREFIX + timestamp + b"}"
+        _second_cache["second"] = second
+    return _second_cache
+
 
 def create_app() -> FastAPI:
     """Create and configure FastAPI application."""
@@ -27,6 +73,8 @@ def create_app() -> FastAPI:
         description=settings.API_DESCRIPTION,
         version=settings.API_VERSION,
         lifespan=lifespan,
+        # Serialize endpoint return values with orjson instead of stdlib json
+        default_response_class=ORJSONResponse,
         # Configure Swagger UI to work better with different environments
         swagger_ui_parameters={
             "deepLinking": True,
@@ -41,45 +89,51 @@ def create_app() -> FastAPI:
     # Add CORS middleware
     app.add_middleware(
         CORSMiddleware,
-        allow_origins=settings.CORS_ORIGINS,
+        # CORSMiddleware only does `"*" in` / `origin in` checks, a frozenset works as-is
+        allow_origins=settings.CORS_ORIGINS_SET,
         allow_credentials=settings.CORS_CREDENTIALS,
         allow_methods=settings.CORS_METHODS,
         allow_headers=settings.CORS_HEADERS,
     )
 
-    # Add shutdown middleware FIRST (outermost layer for graceful shutdown)
-    app.middleware("http")(shutdown_middleware)
+    # Middlewares are pure ASGI classes (no BaseHTTPMiddleware task group or
+    # Request/Response wrapping); the last one added runs first.
+
+    # Add shutdown middleware (tracks in-flight requests for graceful shutdown)
+    app.add_middleware(ShutdownMiddleware)
 
     # Add request ID middleware (for tracing)
-    app.middleware("http")(request_id_middleware)
+    app.add_middleware(RequestIDMiddleware)
 
     # Add request limits middleware (body size, etc.)
-    app.middleware("http")(request_limits_middleware)
+    app.add_middleware(RequestLimitsMiddleware)
 
     # Add metrics middleware
-    app.middleware("http")(metrics_middleware)
+    app.add_middleware(MetricsMiddleware)
 
     # Add security middleware
-    app.middleware("http")(security_middleware)
+    app.add_middleware(SecurityMiddleware)
 
-    # Add exception handlers
+    # Add request info middleware (client IP, body size for the ones above)
+    app.add_middleware(RequestInfoMiddleware)
+
+    # Add exception handlers (before the probe app below copies them)
+    app.add_exception_handler(StarletteHTTPException, http_exception_handler)
     app.add_exception_handler(RequestValidationError, validation_exception_handler)
 
-    # Add root endpoint for Swagger access
-    from datetime import datetime
+    # Add probe bypass middleware LAST so it runs first: health probes go to
+    # the router with only the shutdown check (readiness must turn 503 while
+    # draining) and the app's exception handlers
+    probe_app = ExceptionMiddleware(
+        ShutdownMiddleware(app.router), handlers=app.exception_handlers
+    )
+    app.add_middleware(ProbeBypassMiddleware, probe_app=probe_app)
 
+    # Add root endpoint for Swagger access
     @app.get("/")
     async def root():
         """Root endpoint providing a welcome message and API information."""
-        return {
-            "message": "LLMOps Secure API is running!",
-            "version": settings.API_VERSION,
-            "docs": "/docs",
-            "redoc": "/redoc",
-            "health": "/health",
-            "health_detailed": "/health/detailed",
-            "timestamp": datetime.utcnow().isoformat() + "Z",
-        }
+        return Response(content=_cached_bodies()["root"], media_type="application/json")
 
     # Root-level health endpoints for Docker/Kubernetes
     @app.get("/health", tags=["health"])
@@ -90,10 +144,7 @@ def create_app() -> FastAPI:
         For Docker healthcheck and load balancer probes.
         Always returns 200 if the application is running.
         """
-        return {
-            "status": "alive",
-            "timestamp": datetime.utcnow().isoformat() + "Z",
-        }
+        return Response(content=_cached_bodies()["health"], media_type="application/json")
 
     @app.get("/health/detailed", tags=["health"])
     async def root_health_detailed():
@@ -102,7 +153,6 @@ def create_app() -> FastAPI:
 
         Redirects to /system/health/detailed for full dependency checks.
         """
-        from fastapi.responses import JSONResponse
         from services.health_checker import health_checker
 
         results = await health_checker.check_all(use_cache=True)
@@ -122,10 +172,10 @@ def create_app() -> FastAPI:
         response_data = {
             "status": "healthy" if all_healthy else "degraded",
             "checks": checks,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _cached_bodies()["iso"],
         }
 
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=200 if all_healthy else 503,
             content=response_data,
         )
@@ -135,13 +185,9 @@ def create_app() -> FastAPI:
     async def v1_models():
         """OpenAI-compatible models endpoint at root level."""
         try:
-            import requests
-
-            from config.settings import settings
+            from services.litellm_client import get_models_json
 
-            response = requests.get(f"{settings.LITELLM_URL}/models")
-            response.raise_for_status()
-            return response.json()
+            return Response(content=await get_models_json(), media_type="application/json")
         except Exception as e:
             from fastapi import HTTPException
 
@@ -0,0 +1,67 @@
+"""Environment validation run once at startup.
+
+Fails fast when required secrets are missing or left at a known insecure
+default, and warns about recommended variables that fall back to defaults.
+"""
+
+import logging
+import os
+import sys
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+# Secrets that must be provided through the environment
+REQUIRED_VARS = ("JWT_SECRET_KEY",)
+
+# Variables with a working Docker Compose default, but worth setting explicitly
+RECOMMENDED_VARS = (
+    "LITELLM_URL",
+    "MLFLOW_TRACKING_URI",
+    "QDRANT_URL",
+    "TEI_URL",
+)
+
+# Placeholder values that must never be used as a real secret (compared lowercased)
+_INSECURE_DEFAULTS = frozenset({
+    "your-secret-key-change-in-production",
+    "your-secret-key",
+    "secret",
+    "changeme",
+})
+
+
+def validate_required_env_vars() -> List[str]:
+    """Return a list of validation errors for the current environment."""
+    errors = []
+
+    for var in REQUIRED_VARS:
+        if not os.getenv(var):
+            errors.append(f"{var} must be set")
+
+    jwt_secret = os.getenv("JWT_SECRET_KEY")
+    if jwt_secret and jwt_secret.lower() in _INSECURE_DEFAULTS:
+        errors.append("JWT_SECRET_KEY must be set and different from default")
+
+    return errors
+
+
+def warn_missing_recommended_vars() -> List[str]:
+    """Log a warning for each recommended variable that is not set."""
+    missing = [var for var in RECOMMENDED_VARS if not os.getenv(var)]
+    for var in missing:
+        logger.warning("%s is not set, using default value", var)
+    return missing
+
+
+def validate_environment_on_startup() -> None:
+    """Validate the environment and exit the process if it is not safe to start."""
+    errors = validate_required_env_vars()
+    warn_missing_recommended_vars()
+
+    if errors:
+        for error in errors:
+            logger.critical("Error: %s", error)
+        sys.exit(1)
+
+    logger.info("Environment validation passed")
@@ -1,49 +1,211 @@
 """Application lifespan management.
 
-TODO Exercise 2: This lifespan has no proper shutdown handling!
-- No cleanup of Qdrant connections (connection leak)
-- No waiting for in-flight requests
-- No finalization of MLflow runs
-- Requests are interrupted abruptly
-
-Students should:
-- Track active requests with middleware
-- Wait for in-flight requests before shutdown (with timeout)
-- Clean up Qdrant connections
-- Finalize MLflow runs
-- Add proper logging during shutdown
+Startup sets up MLflow, the exact cache writer and the MLflow trace worker.
+Shutdown stops accepting new requests, waits for in-flight ones (with a
+timeout), records the queued traces, finalizes MLflow runs and closes
+Qdrant/HTTP connections.
+
+In-flight requests are counted by the shutdown middleware through
+increment_active_requests/decrement_active_requests. The counter is a plain
+int: every caller runs on the single-threaded event loop, so no lock is
+needed (each uvicorn worker process has its own counter).
+
+When served by GracefulShutdownServer (see main.py), SIGTERM/SIGINT flip the
+shutdown flag as soon as they arrive (before uvicorn gets to the lifespan
+shutdown), so readiness probes and new requests get a 503 right away while
+uvicorn's own signal handling proceeds as usual.
 """
 
+import asyncio
 from contextlib import asynccontextmanager
+from types import FrameType
+from typing import Optional
 
+import uvicorn
 from fastapi import FastAPI
+from routers.llm import (
+    cache,
+    client as llm_client,
+    start_trace_worker,
+    stop_trace_worker,
+)
+from services.health_checker import health_checker
+from services.litellm_client import close_litellm_client
 from services.mlflow_service import mlflow_service
 
+from config.settings import fetch_default_model
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
+# Max time to wait for in-flight requests during shutdown
+SHUTDOWN_TIMEOUT_SECONDS = 30
+
+_active_requests = 0
+_shutdown_event = asyncio.Event()
+
+# Set whenever no request is in flight, so shutdown can await it instead of polling
+_all_idle_event = asyncio.Event()
+_all_idle_event.set()
+
+
+def increment_active_requests():
+    """Register a request as in-flight."""
+    global _active_requests
+    _active_requests += 1
+    if _active_requests == 1:
+        _all_idle_event.clear()
+
+
+def decrement_active_requests():
+    """Mark an in-flight request as finished."""
+    global _active_requests
+    _active_requests -= 1
+    if _active_requests == 0:
+        _all_idle_event.set()
+
+
+def get_active_requests() -> int:
+    """Return the number of in-flight requests."""
+    return _active_requests
+
+
+# Return True once shutdown has started (bound method, no wrapper frame per request)
+is_shutting_down = _shutdown_event.is_set
+
+
+def trigger_shutdown():
+    """Start draining: the shutdown middleware rejects new requests from now on."""
+    if not _shutdown_event.is_set():
+        print("Shutdown signal received, no longer accepting new requests")
+        _shutdown_event.set()
+
+
+class GracefulShutdownServer(uvicorn.Server):
+    """uvicorn server that starts draining as soon as SIGTERM/SIGINT arrives.
+
+    handle_exit is the method uvicorn registers as its signal handler, on any
+    event loop (asyncio or uvloop): the flag is set first, then uvicorn's
+    normal exit sequence runs.
     """
-    Manage application lifecycle.
-    
-    TODO Exercise 2: Currently does NO cleanup on shutdown!
+
+    def handle_exit(self, sig: int, frame: Optional[FrameType]) -> None:
+        trigger_shutdown()
+        super().handle_exit(sig, frame)
+
+
+async def wait_for_active_requests(timeout: float = SHUTDOWN_TIMEOUT_SECONDS) -> bool:
+    """Wait until no request is in flight. Returns False on timeout."""
+    if _active_requests == 0:
+        return True
+    print(f"Waiting for {_active_requests} active request(s) to complete...")
+    try:
+        await asyncio.wait_for(_all_idle_event.wait(), timeout=timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+
+async def _flush_traces():
+    """Record the MLflow traces still queued and stop the trace worker."""
+    try:
+        await stop_trace_worker()
+        print("Queued MLflow traces recorded")
+    except Exception as e:
+        print(f"Failed to flush MLflow traces: {e}")
+
+
+async def _finalize_mlflow():
+    """Record the queued MLflow traces, then finalize active MLflow runs.
+
+    Stays on the event loop thread: MLflow's active-run stack is thread-local.
     """
+    await _flush_traces()
+    await mlflow_service.finalize_active_runs()
+
+
+async def _close_cache():
+    """Flush queued exact cache writes and close the Qdrant client."""
+    try:
+        await cache.close()
+        print("Exact cache flushed and closed")
+    except Exception as e:
+        print(f"Failed to close exact cache: {e}")
+
+
+async def _close_http_clients():
+    """Close pooled connections to LiteLLM and the health check client."""
+    try:
+        await close_litellm_client()
+    except Exception as e:
+        print(f"Failed to close LiteLLM client: {e}")
+
+    try:
+        await llm_client.close()
+    except Exception as e:
+        print(f"Failed to close OpenAI client: {e}")
+
+    try:
+        await health_checker.close()
+    except Exception as e:
+        print(f"Failed to close health checker: {e}")
+
+
+async def cleanup_resources():
+    """Run the independent shutdown cleanups concurrently."""
+    await asyncio.gather(
+        _finalize_mlflow(),
+        _close_cache(),
+        _close_http_clients(),
+        return_exceptions=True,
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Manage application lifecycle."""
     # ===== STARTUP =====
     print("Starting LLMOps Secure API...")
 
-    # Setup MLflow experiment
-    try:
-        await mlflow_service.setup_experiment()
+    # Setup MLflow experiment, exact cache and default model concurrently
+    mlflow_result, cache_result, default_model = await asyncio.gather(
+        mlflow_service.setup_experiment(),
+        cache.start(),
+        fetch_default_model(),
+        return_exceptions=True,
+    )
+    if isinstance(mlflow_result, Exception):
+        print(f"Failed to setup MLflow experiment: {mlflow_result}")
+    else:
         print("MLflow experiment setup completed")
-    except Exception as e:
-        print(f"Failed to setup MLflow experiment: {e}")
+    if isinstance(cache_result, Exception):
+        raise cache_result
+    print(f"Default model: {default_model}")
+
+    start_trace_worker()
 
     print("LLMOps Secure API started successfully")
 
     yield
 
     # ===== SHUTDOWN =====
-    # TODO Exercise 2: This does NOTHING!
-    # - No waiting for active requests
-    # - No cleanup of connections
-    # - No finalization of MLflow runs
     print("Shutting down LLMOps Secure API...")
+
+    loop = asyncio.get_running_loop()
+    shutdown_started = loop.time()
+
+    # Stop accepting new requests (if no signal did already) and let in-flight ones finish
+    trigger_shutdown()
+    if await wait_for_active_requests():
+        print("All in-flight requests completed")
+    else:
+        print(
+            f"Shutdown timeout after {SHUTDOWN_TIMEOUT_SECONDS}s, "
+            f"{_active_requests} request(s) still active"
+        )
+
+    # Independent cleanups run concurrently, within what is left of the budget
+    remaining = max(SHUTDOWN_TIMEOUT_SECONDS - (loop.time() - shutdown_started), 1)
+    try:
+        await asyncio.wait_for(cleanup_resources(), timeout=remaining)
+    except asyncio.TimeoutError:
+        print(f"Resource cleanup did not finish within {remaining:.1f}s")
+
+    print("LLMOps Secure API shutdown complete")
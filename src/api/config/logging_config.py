@@ -0,0 +1,151 @@
+"""Structured JSON logging configuration.
+
+Request handlers only enqueue log records; a QueueListener thread does the
+JSON formatting and the blocking stdout writes.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+import orjson
+from middleware.request_id import get_request_context
+
+
+class JSONFormatter(logging.Formatter):
+    """Format log records as single-line JSON documents."""
+
+    # No per-instance state of our own; configuration lives at class level
+    __slots__ = ()
+
+    # Bound once to skip the module attribute lookups per record
+    _gmtime = staticmethod(time.gmtime)
+    _strftime = staticmethod(time.strftime)
+
+    # Structured fields passed through logger.*(..., extra={...})
+    _EXTRA_FIELDS = frozenset({
+        "request_id",
+        "method",
+        "path",
+        "status_code",
+        "duration_ms",
+        "client_ip",
+        "user",
+        "model",
+        "cache_hit",
+        "tokens",
+        "cost",
+    })
+
+    def format(self, record: logging.LogRecord) -> str:
+        # record.created is already stamped by LogRecord, no need for datetime.utcnow()
+        created = record.created
+        millis = int((created - int(created)) * 1000)
+        log_data = {
+            "timestamp": f"{self._strftime('%Y-%m-%dT%H:%M:%S', self._gmtime(created))}.{millis:03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+
+        # Source location is only worth its allocation on warnings and errors
+        if record.levelno >= logging.WARNING:
+            log_data["location"] = {
+                "module": record.module,
+                "function": record.funcName,
+                "line": record.lineno,
+            }
+
+        # Only look at the extra fields actually set on this record
+        record_dict = record.__dict__
+        for field in self._EXTRA_FIELDS & record_dict.keys():
+            log_data[field] = record_dict[field]
+
+        if (extra_data := record_dict.get("extra_data")) and isinstance(extra_data, dict):
+            log_data.update(extra_data)
+
+        if record.exc_info is not None:
+            # Reuse the traceback text cached on the record by other handlers
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+            log_data["exception"] = record.exc_text
+
+        return orjson.dumps(log_data, default=str).decode()
+
+
+class RequestContextFilter(logging.Filter):
+    """Attach the current request ID to every log record."""
+
+    __slots__ = ()
+
+    # Bound once at class creation instead of importing on every record
+    _get_ctx = staticmethod(get_request_context)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = self._get_ctx().get("request_id", "-")
+        return True
+
+
+class InProcessQueueHandler(QueueHandler):
+    """QueueHandler that hands records to the listener thread unflattened.
+
+    The stock prepare() formats the record and strips exc_info so it can be
+    pickled across processes. The queue here is in-process, so only the
+    message arguments are resolved now (they may be mutated later) and the
+    JSON formatting is left to the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+_queue_listener: Optional[QueueListener] = None
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the listener thread (safe to call twice)."""
+    global _queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        _queue_listener = None
+
+
+def setup_logging(level: str = None) -> None:
+    """Configure the root logger to emit JSON logs on stdout."""
+    global _queue_listener
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+
+    stop_logging()
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JSONFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = InProcessQueueHandler(log_queue)
+    # The request context lives in a ContextVar, so it must be read on the
+    # producer side, before the record crosses to the listener thread
+    queue_handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _queue_listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _queue_listener.start()
+
+    # httpx logs every outgoing request at INFO
+    for name in ("httpx", "httpcore"):
+        logging.getLogger(name).setLevel(max(logging.WARNING, root.level))
+
+
+# Stopped at interpreter exit rather than in the lifespan, so uvicorn's own
+# shutdown messages (logged after the lifespan ends) are still written out
+atexit.register(stop_logging)
@@ -13,7 +13,8 @@ Students should:
 """
 
 import os
-from typing import List
+import re
+from typing import List, Optional
 
 
 # INSECURE: Hardcoded secret key visible in source code!
@@ -23,6 +24,8 @@ JWT_ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
 # INSECURE: Allows ALL origins - vulnerable to CSRF attacks!
 CORS_ORIGINS = ["*"]
+# Same origins as a frozenset, so CORS origin checks are O(1) membership tests
+CORS_ORIGINS_SET = frozenset(CORS_ORIGINS)
 CORS_CREDENTIALS = True
 CORS_METHODS = ["GET", "POST", "PUT", "DELETE"]
 CORS_HEADERS = ["*"]
@@ -38,8 +41,18 @@ MLFLOW_TRACKING_URI = os.getenv("MLFLOW_TRACKING_URI", "http://mlflow:5000")
 
 # Qdrant Settings
 QDRANT_URL = os.getenv("QDRANT_URL", "http://qdrant:6333")
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
 TEI_URL = os.getenv("TEI_URL", "http://tei-embeddings:80")
 CACHE_TTL = 1800
+# Start the LLM call alongside the exact cache's Qdrant lookup instead of after
+# a miss: a miss no longer waits for the lookup first, but every hit found in
+# Qdrant (not in the in-process front cache) pays for an LLM call it throws
+# away. Only worth it at low hit rates (compare the "used" and "wasted" series
+# of llmops_llm_speculative_calls_total).
+SPECULATE_ON_CACHE_MISS = os.getenv("SPECULATE_ON_CACHE_MISS", "false").lower() == "true"
+
+# Max /llm/generate requests processed at once per worker; extra ones wait for a slot
+MAX_CONCURRENT_LLM_REQUESTS = int(os.getenv("MAX_CONCURRENT_LLM_REQUESTS", "64"))
 
 
 class SecurityConfig:
@@ -53,6 +66,7 @@ class SecurityConfig:
     MAX_MAX_TOKENS = 2000
     ALLOWED_MODEL_PATTERN = r"^(groq|gpt|gemini|openrouter)-[a-z0-9-]+$"
     RATE_LIMIT_REQUESTS_PER_MINUTE = 60
+    MAX_REQUEST_BODY_SIZE = 1024 * 1024  # 1MB
     SUSPICIOUS_PATTERNS = [
         # Basic instruction overrides
         r"(?i)ignore.{0,20}(all|previous|above).{0,20}(instruct|instruction|rules|guidelines)",
@@ -77,31 +91,66 @@ class SecurityConfig:
         # New line injection
         r"\n\n(system|admin|developer|root|#|>|\$|%|\\?|!|@|&|\*)",
     ]
-
-
-def get_default_model(litellm_url: str) -> str:
-    """Get the best available model based on priority."""
-    import requests
+    # All SUSPICIOUS_PATTERNS fused into one alternation (set below the class)
+    SUSPICIOUS_REGEX: "re.Pattern[str]"
+
+
+# Compile once at import so validators do a single scan per prompt.
+# Every pattern is matched case-insensitively anyway, so the per-pattern
+# "(?i)" prefixes (only valid at the start of a pattern) become a global flag.
+# Pattern i is wrapped in a group named "p<i>": match.lastgroup tells which
+# SUSPICIOUS_PATTERNS entry matched. DOTALL is scoped ("(?s:...)") to the
+# patterns that actually use "." instead of being set for the whole regex.
+def _suspicious_group(index: int, pattern: str) -> str:
+    pattern = pattern.removeprefix("(?i)")
+    if "." in pattern:
+        pattern = f"(?s:{pattern})"
+    return f"(?P<p{index}>{pattern})"
+
+
+SecurityConfig.SUSPICIOUS_REGEX = re.compile(
+    "|".join(
+        _suspicious_group(index, pattern)
+        for index, pattern in enumerate(SecurityConfig.SUSPICIOUS_PATTERNS)
+    ),
+    re.IGNORECASE,
+)
+
+
+# Models in order of preference, and the fallback when LiteLLM can't be reached
+PRIORITY_MODELS = (
+    "groq-kimi-primary",
+    "gpt-4o-secondary",
+    "gemini-third",
+    "openrouter-fallback",
+)
+FALLBACK_MODEL = "groq-kimi-primary"
+
+# Resolved once at startup by fetch_default_model()
+_default_model_cache: Optional[str] = None
+
+
+async def fetch_default_model() -> str:
+    """Resolve the best available model from LiteLLM and cache it (called at startup)."""
+    global _default_model_cache
+    from services.litellm_client import litellm_client
+
+    model = FALLBACK_MODEL
     try:
-        response = requests.get(f"{litellm_url}/models", timeout=5)
+        response = await litellm_client.get("/models")
         response.raise_for_status()
-        available_models = [model["id"] for model in response.json().get("data", [])]
-
-        priority_models = [
-            "groq-kimi-primary",
-            "gpt-4o-secondary",
-            "gemini-third",
-            "openrouter-fallback",
-        ]
-
-        for model in priority_models:
-            if model in available_models:
-                return model
-
+        available_models = {m["id"] for m in response.json().get("data", [])}
+        model = next((m for m in PRIORITY_MODELS if m in available_models), FALLBACK_MODEL)
     except Exception:
         pass
 
-    return "groq-kimi-primary"
+    _default_model_cache = model
+    return model
+
+
+def get_default_model() -> str:
+    """Get the best available model based on priority (no network call)."""
+    return _default_model_cache or FALLBACK_MODEL
 
 
 # Simple settings object for compatibility
@@ -111,6 +160,7 @@ class _Settings:
     JWT_ALGORITHM = JWT_ALGORITHM
     JWT_ACCESS_TOKEN_EXPIRE_MINUTES = JWT_ACCESS_TOKEN_EXPIRE_MINUTES
     CORS_ORIGINS = CORS_ORIGINS
+    CORS_ORIGINS_SET = CORS_ORIGINS_SET
     CORS_CREDENTIALS = CORS_CREDENTIALS
     CORS_METHODS = CORS_METHODS
     CORS_HEADERS = CORS_HEADERS
@@ -120,8 +170,11 @@ class _Settings:
     LITELLM_URL = LITELLM_URL
     MLFLOW_TRACKING_URI = MLFLOW_TRACKING_URI
     QDRANT_URL = QDRANT_URL
+    QDRANT_GRPC_PORT = QDRANT_GRPC_PORT
     TEI_URL = TEI_URL
     CACHE_TTL = CACHE_TTL
+    SPECULATE_ON_CACHE_MISS = SPECULATE_ON_CACHE_MISS
+    MAX_CONCURRENT_LLM_REQUESTS = MAX_CONCURRENT_LLM_REQUESTS
 
 
 settings = _Settings()
@@ -18,5 +18,10 @@ app = create_app()
 
 if __name__ == "__main__":
     import uvicorn
+    from config.lifespan import GracefulShutdownServer
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Run through GracefulShutdownServer (not the uvicorn CLI) so SIGTERM/SIGINT
+    # start draining right away. "auto" picks uvloop and httptools (C extensions
+    # from uvicorn[standard]) when installed, asyncio and h11 otherwise
+    config = uvicorn.Config(app, host="0.0.0.0", port=8000, loop="auto", http="auto")
+    GracefulShutdownServer(config).run()
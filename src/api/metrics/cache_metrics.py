@@ -17,12 +17,6 @@ CACHE_HITS = Counter(
     ['cache_type']  # 'exact', 'semantic', 'miss'
 )
 
-CACHE_SIMILARITY_QUALITY = Counter(
-    'llmops_cache_similarity_quality_total',
-    'Count of semantic cache hits by similarity quality',
-    ['quality']  # 'excellent', 'good', 'fair', 'poor'
-)
-
 # =============================================================================
 # CACHE HISTOGRAMS
 # =============================================================================
@@ -33,32 +27,59 @@ CACHE_LATENCY = Histogram(
     ['cache_type']  # 'exact', 'semantic'
 )
 
+# Its _sum and _count series give the average similarity in PromQL:
+#   rate(llmops_cache_similarity_score_sum[5m]) / rate(llmops_cache_similarity_score_count[5m])
+# The 0.75/0.85/0.95 buckets are the quality tier cutoffs, so tiers are bucket
+# differences at query time, e.g. "good":
+#   sum(rate(llmops_cache_similarity_score_bucket{le="0.95"}[5m]))
+#     - sum(rate(llmops_cache_similarity_score_bucket{le="0.85"}[5m]))
+# (buckets are "<=", so a score exactly on a cutoff lands in the lower tier)
 CACHE_SIMILARITY_SCORE = Histogram(
     'llmops_cache_similarity_score',
     'Semantic cache similarity scores',
-    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 0.99, 1.0)
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95, 0.99, 1.0)
 )
 
 # =============================================================================
 # CACHE GAUGES
 # =============================================================================
+# Both are recomputed from shared MLflow/Qdrant data, so every worker holds the
+# same value; "max" keeps a single series when metrics are aggregated across
+# workers (multiprocess mode, see the /monitoring/metrics endpoint).
 
 CACHE_HIT_RATIO = Gauge(
     'llmops_cache_hit_ratio',
     'Cache hit ratio by type',
-    ['cache_type']  # 'exact', 'semantic'
+    ['cache_type'],  # 'exact', 'semantic'
+    multiprocess_mode='max'
 )
 
 CACHE_PERFORMANCE_SAVINGS = Gauge(
     'llmops_cache_performance_savings_ms',
     'Performance savings from cache hits in milliseconds',
-    ['cache_type']  # 'exact', 'semantic'
+    ['cache_type'],  # 'exact', 'semantic'
+    multiprocess_mode='max'
 )
 
-CACHE_AVG_SEMANTIC_SIMILARITY = Gauge(
-    'llmops_cache_avg_semantic_similarity',
-    'Average semantic similarity score for cache hits'
-)
+# =============================================================================
+# PRE-RESOLVED LABEL CHILDREN
+# =============================================================================
+# .labels() hashes the label values and takes the metric lock on every call;
+# the label sets below are fixed, so their children are resolved once here.
+
+_HIT_EXACT = CACHE_HITS.labels(cache_type="exact")
+_HIT_SEMANTIC = CACHE_HITS.labels(cache_type="semantic")
+_HIT_MISS = CACHE_HITS.labels(cache_type="miss")
+
+_LAT_EXACT = CACHE_LATENCY.labels(cache_type="exact")
+_LAT_SEMANTIC = CACHE_LATENCY.labels(cache_type="semantic")
+
+_SIM_OBSERVE = CACHE_SIMILARITY_SCORE.observe
+
+_HIT = {
+    "exact": (_HIT_EXACT, _LAT_EXACT),
+    "semantic": (_HIT_SEMANTIC, _LAT_SEMANTIC),
+}
 
 # =============================================================================
 # HELPER FUNCTIONS
@@ -66,20 +87,20 @@ CACHE_AVG_SEMANTIC_SIMILARITY = Gauge(
 
 def record_cache_hit(cache_type: str, latency_seconds: float):
     """Record a cache hit with latency."""
-    CACHE_HITS.labels(cache_type=cache_type).inc()
-    CACHE_LATENCY.labels(cache_type=cache_type).observe(latency_seconds)
+    children = _HIT.get(cache_type)
+    if children is None:
+        children = (
+            CACHE_HITS.labels(cache_type=cache_type),
+            CACHE_LATENCY.labels(cache_type=cache_type),
+        )
+    hit_child, lat_child = children
+    hit_child.inc()
+    lat_child.observe(latency_seconds)
 
 
 def record_cache_miss():
     """Record a cache miss."""
-    CACHE_HITS.labels(cache_type="miss").inc()
-
-
-def update_cache_ratio(exact_hits: float, misses: float):
-    """Update the cache hit ratio gauge."""
-    total = exact_hits + misses
-    if total > 0:
-        CACHE_HIT_RATIO.labels(cache_type="exact").set(exact_hits / total)
+    _HIT_MISS.inc()
 
 
 def record_performance_savings(cache_type: str, savings_ms: float):
@@ -88,16 +109,5 @@ def record_performance_savings(cache_type: str, savings_ms: float):
 
 
 def record_semantic_similarity(similarity_score: float):
-    """Record semantic similarity score and update quality counters."""
-    CACHE_SIMILARITY_SCORE.observe(similarity_score)
-    CACHE_AVG_SEMANTIC_SIMILARITY.set(similarity_score)
-    
-    # Categorize quality
-    if similarity_score >= 0.95:
-        CACHE_SIMILARITY_QUALITY.labels(quality="excellent").inc()
-    elif similarity_score >= 0.85:
-        CACHE_SIMILARITY_QUALITY.labels(quality="good").inc()
-    elif similarity_score >= 0.75:
-        CACHE_SIMILARITY_QUALITY.labels(quality="fair").inc()
-    else:
-        CACHE_SIMILARITY_QUALITY.labels(quality="poor").inc()
+    """Record semantic similarity score (quality tiers are derived from its buckets)."""
+    _SIM_OBSERVE(similarity_score)
@@ -0,0 +1,49 @@
+"""
+LLM Call Metrics Module
+
+Prometheus metrics about the calls made to the LLM through LiteLLM.
+"""
+
+from prometheus_client import Counter, Gauge
+
+# =============================================================================
+# LLM COUNTERS
+# =============================================================================
+
+LLM_SPECULATIVE_CALLS = Counter(
+    'llmops_llm_speculative_calls_total',
+    'LLM calls started alongside the exact cache lookup, by outcome',
+    ['outcome']  # 'used' (cache miss), 'wasted' (cache hit)
+)
+
+# =============================================================================
+# LLM GAUGES
+# =============================================================================
+
+# Per-worker count. In multiprocess mode each worker exports its own series
+# (pid label), sum them in queries: 'all' needs no mark_process_dead hook on
+# worker exit, unlike 'livesum', which would keep summing dead workers' values
+LLM_INFLIGHT = Gauge(
+    'llmops_llm_inflight_requests',
+    'Generation requests currently holding a concurrency slot',
+    multiprocess_mode='all'
+)
+
+# =============================================================================
+# PRE-RESOLVED LABEL CHILDREN
+# =============================================================================
+
+_SPECULATIVE_USED = LLM_SPECULATIVE_CALLS.labels(outcome="used")
+_SPECULATIVE_WASTED = LLM_SPECULATIVE_CALLS.labels(outcome="wasted")
+
+
+# =============================================================================
+# HELPER FUNCTIONS
+# =============================================================================
+
+def record_speculative_call(used: bool):
+    """Record whether a speculative LLM call was used (cache miss) or wasted (hit)."""
+    if used:
+        _SPECULATIVE_USED.inc()
+    else:
+        _SPECULATIVE_WASTED.inc()
@@ -1,11 +1,10 @@
 """Metrics middleware for capturing request metrics."""
 
 import time
-from fastapi import Request, Response
-from fastapi.responses import JSONResponse
+from functools import lru_cache
 from prometheus_client import Counter, Histogram
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import logging
-from typing import Union
 
 logger = logging.getLogger(__name__)
 
@@ -44,130 +43,117 @@ from metrics.cache_metrics import (
     CACHE_HITS,
     CACHE_LATENCY,
     CACHE_SIMILARITY_SCORE,
-    CACHE_SIMILARITY_QUALITY,
     CACHE_HIT_RATIO,
     CACHE_PERFORMANCE_SAVINGS,
-    CACHE_AVG_SEMANTIC_SIMILARITY,
     record_cache_hit,
     record_cache_miss,
-    update_cache_ratio,
     record_performance_savings,
     record_semantic_similarity,
 )
 
-def _get_endpoint_from_request(request: Request) -> str:
-    """Extract and normalize endpoint path from request."""
-    endpoint = str(request.url.path)
-    if endpoint.startswith('/'):
-        endpoint = endpoint[1:]
-    if not endpoint:
-        endpoint = "root"
-    return endpoint
-
-def _get_content_length(headers) -> int:
-    """Safely extract content length from headers."""
-    try:
-        return int(headers.get("content-length", 0))
-    except (ValueError, TypeError):
-        return 0
-
-def _get_response_size(response: Union[Response, JSONResponse]) -> int:
-    """Safely extract response size."""
-    try:
-        if hasattr(response, 'body'):
-            # For Response objects with body attribute
-            body = response.body
-            if isinstance(body, bytes):
-                return len(body)
-            elif isinstance(body, str):
-                return len(body.encode('utf-8'))
-        
-        # Try to get from headers
-        if hasattr(response, 'headers'):
-            content_length = response.headers.get("content-length")
-            if content_length:
-                return int(content_length)
-        
-        return 0
-    except (ValueError, TypeError, AttributeError):
-        return 0
-
-async def metrics_middleware(request: Request, call_next):
-    """Enhanced metrics middleware with better error handling and performance optimization."""
-    start_time = time.time()
-    method = request.method
-    endpoint = _get_endpoint_from_request(request)
-    
-    # Skip metrics collection for certain endpoints to reduce overhead
-    if endpoint in ["health", "docs", "redoc", "openapi.json"]:
-        return await call_next(request)
-    
-    # Capture request size without consuming body
-    request_size = _get_content_length(request.headers)
-    if request_size > 0:
+@lru_cache(maxsize=1024)
+def _request_children(method: str, endpoint: str) -> tuple:
+    """Resolve (duration, request size, response size) children once per endpoint."""
+    return (
+        REQUEST_DURATION.labels(method=method, endpoint=endpoint),
+        REQUEST_SIZE.labels(method=method, endpoint=endpoint),
+        RESPONSE_SIZE.labels(method=method, endpoint=endpoint),
+    )
+
+@lru_cache(maxsize=1024)
+def _count_child(method: str, endpoint: str, status: str):
+    """Resolve the REQUEST_COUNT child once per (method, endpoint, status)."""
+    return REQUEST_COUNT.labels(method=method, endpoint=endpoint, status=status)
+
+# Unmatched paths (404s, scanners) all share one label value
+UNMATCHED_ENDPOINT = "other"
+
+# Requests not worth instrumenting, by raw path (health probes never get here,
+# see ProbeBypassMiddleware)
+_SKIPPED_PATHS = frozenset({"/docs", "/redoc", "/openapi.json"})
+
+def _get_endpoint_from_scope(scope: Scope) -> str:
+    """Endpoint label from the matched route template (e.g. "users/{id}").
+
+    Labelling with the raw URL path would create one time series per ID
+    seen; the router sets scope["route"] once a route matched.
+    """
+    path = getattr(scope.get("route"), "path", None)
+    if not path:
+        return UNMATCHED_ENDPOINT
+    endpoint = path[1:] if path.startswith('/') else path
+    return endpoint or "root"
+
+class MetricsMiddleware:
+    """Pure ASGI metrics middleware.
+
+    Reads status code and response size (Content-Length) off the response
+    start message, instead of wrapping the request in BaseHTTPMiddleware's
+    Request/Response objects and task group.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+
+        # Skip metrics collection for certain endpoints to reduce overhead
+        if path in _SKIPPED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        start_time = time.perf_counter()
+
+        status_code = "500"  # Default to 500 if no response gets started
+        response_size = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, response_size
+            if message["type"] == "http.response.start":
+                status_code = str(message["status"])
+                # Fixed-size responses declare their size; streamed ones are not observed
+                for name, value in message.get("headers", ()):
+                    if name == b"content-length":
+                        try:
+                            response_size = int(value)
+                        except ValueError:
+                            pass
+                        break
+            await send(message)
+
         try:
-            REQUEST_SIZE.labels(method=method, endpoint=endpoint).observe(request_size)
+            await self.app(scope, receive, send_wrapper)
         except Exception as e:
-            logger.warning(f"Failed to record request size metric: {e}")
-    
-    response = None
-    status_code = "500"  # Default to 500 in case of unexpected errors
-    
-    try:
-        # Call next middleware/handler
-        response = await call_next(request)
-        
-        # Extract status code from response
-        if hasattr(response, 'status_code'):
-            status_code = str(response.status_code)
-        else:
-            # Fallback for responses without status_code attribute
-            status_code = "200"
-        
-        # Capture response size
-        response_size = _get_response_size(response)
-        if response_size > 0:
-            try:
-                RESPONSE_SIZE.labels(method=method, endpoint=endpoint).observe(response_size)
-            except Exception as e:
-                logger.warning(f"Failed to record response size metric: {e}")
-        
-    except Exception as e:
-        # Handle any exception that occurs during request processing
-        status_code = "500"
-        
-        # Log the error with context
-        duration = time.time() - start_time
-        logger.error(
-            f"Request {method} {endpoint} - EXCEPTION - {duration:.3f}s: {type(e).__name__}: {e}",
-            exc_info=True
-        )
-        
-        # Record error metrics with exception handling
-        try:
-            REQUEST_COUNT.labels(method=method, endpoint=endpoint, status=status_code).inc()
-            REQUEST_DURATION.labels(method=method, endpoint=endpoint).observe(duration)
-        except Exception as metric_error:
-            logger.warning(f"Failed to record error metrics: {metric_error}")
-        
-        # Re-raise the exception to maintain the middleware chain
-        raise
-    
-    finally:
-        # Always record metrics, even if an exception occurred
-        # This ensures we capture timing even for failed requests
-        duration = time.time() - start_time
-        
-        # Record successful request metrics (only if no exception occurred)
-        if response is not None:
-            try:
-                REQUEST_COUNT.labels(method=method, endpoint=endpoint, status=status_code).inc()
-                REQUEST_DURATION.labels(method=method, endpoint=endpoint).observe(duration)
-                
-                # Log successful request (only for non-metrics endpoints to reduce noise)
-                if not endpoint.startswith("monitoring"):
-                    logger.debug(f"Request {method} {endpoint} - {status_code} - {duration:.3f}s")
-            except Exception as e:
-                logger.warning(f"Failed to record success metrics: {e}")
-    
-    return response
+            status_code = "500"
+            logger.error(
+                f"Request {method} {path} - EXCEPTION - "
+                f"{time.perf_counter() - start_time:.3f}s: {type(e).__name__}: {e}",
+                exc_info=True
+            )
+            raise
+        finally:
+            # Recorded once, whether the request succeeded or raised.
+            # The route is only known once the app has routed the request.
+            duration = time.perf_counter() - start_time
+            endpoint = _get_endpoint_from_scope(scope)
+            duration_child, request_size_child, response_size_child = _request_children(method, endpoint)
+
+            # Request size from the header (read by RequestInfoMiddleware), without consuming the body
+            request_size = scope["state"]["content_length"]
+            if request_size > 0:
+                request_size_child.observe(request_size)
+
+            _count_child(method, endpoint, status_code).inc()
+            duration_child.observe(duration)
+            if response_size > 0:
+                response_size_child.observe(response_size)
+
+            # Log request (only for non-metrics endpoints to reduce noise)
+            if logger.isEnabledFor(logging.DEBUG) and not endpoint.startswith("monitoring"):
+                logger.debug("Request %s %s - %s - %.3fs", method, endpoint, status_code, duration)
@@ -0,0 +1,37 @@
+"""Fast path for liveness/readiness probes."""
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# Paths polled by Docker/Kubernetes health checks and load balancers
+PROBE_PATHS = frozenset({"/health", "/health/detailed", "/system/health"})
+
+
+def _is_probe(scope: Scope) -> bool:
+    """A plain GET on a probe path, not sent by a browser (no Origin header)."""
+    if scope["type"] != "http" or scope["method"] != "GET" or scope["path"] not in PROBE_PATHS:
+        return False
+    return all(name != b"origin" for name, _ in scope["headers"])
+
+
+class ProbeBypassMiddleware:
+    """Send probe requests straight to probe_app, skipping the rest of the stack.
+
+    Probes can hit every pod several times a second; they have no use for
+    rate limiting, security checks, request IDs or request metrics (and
+    would otherwise dominate those numbers). Mounting the health routes on a
+    sub-app would not help: mounts sit below the parent app's middleware.
+
+    Only GET requests without an Origin header take the bypass. Other
+    methods (405s, CORS preflights) and cross-origin browser calls go
+    through the full stack, CORS included.
+    """
+
+    def __init__(self, app: ASGIApp, probe_app: ASGIApp) -> None:
+        self.app = app
+        self.probe_app = probe_app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if _is_probe(scope):
+            await self.probe_app(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
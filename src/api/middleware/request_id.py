@@ -0,0 +1,90 @@
+"""Request ID middleware for request tracing."""
+
+import logging
+import os
+import time
+from contextvars import ContextVar
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+# ASGI header names are lowercased bytes
+_REQUEST_ID_HEADER_RAW = REQUEST_ID_HEADER.lower().encode("latin-1")
+
+# Context of the request being handled, read by the logging filter
+_request_context: ContextVar[dict] = ContextVar("request_context", default={})
+
+
+# Request IDs are trace IDs, not secrets: 8 raw OS random bytes are enough
+_urandom = os.urandom
+
+
+def generate_request_id() -> str:
+    """Generate a short unique request ID."""
+    return "req_" + _urandom(8).hex()
+
+
+def get_request_context() -> dict:
+    """Return the context (request_id, method, path) of the current request."""
+    return _request_context.get()
+
+
+class RequestIDMiddleware:
+    """Assign a request ID, expose it in logs and echo it in the response headers."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == _REQUEST_ID_HEADER_RAW:
+                request_id = value.decode("latin-1")
+                break
+        request_id = request_id or generate_request_id()
+
+        method = scope["method"]
+        path = scope["path"]
+        token = _request_context.set(
+            {"request_id": request_id, "method": method, "path": path}
+        )
+        # Backs request.state.request_id for the endpoints
+        scope.setdefault("state", {})["request_id"] = request_id
+        start_time = time.perf_counter()
+
+        # Checked up front so the extra dicts are not built when INFO is filtered out
+        log_info = logger.isEnabledFor(logging.INFO)
+        if log_info:
+            logger.info(
+                "Request started",
+                extra={"extra_data": {"method": method, "path": path}},
+            )
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[REQUEST_ID_HEADER] = request_id
+                if log_info:
+                    logger.info(
+                        "Request completed",
+                        extra={
+                            "extra_data": {
+                                "method": method,
+                                "path": path,
+                                "status_code": message["status"],
+                                "duration_ms": round((time.perf_counter() - start_time) * 1000, 2),
+                            }
+                        },
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_context.reset(token)
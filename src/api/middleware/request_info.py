@@ -0,0 +1,33 @@
+"""Per-request values shared by the other middlewares, computed once."""
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class RequestInfoMiddleware:
+    """Store the client IP and declared body size in scope["state"].
+
+    Runs first, so the security, request limits and metrics middlewares read
+    state["client_ip"] / state["content_length"] instead of each walking the
+    client tuple and the raw header list again.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            client = scope.get("client")
+            content_length = 0
+            for name, value in scope["headers"]:
+                if name == b"content-length":
+                    try:
+                        content_length = int(value)
+                    except ValueError:
+                        pass
+                    break
+
+            state = scope.setdefault("state", {})
+            state["client_ip"] = client[0] if client else "unknown"
+            state["content_length"] = content_length
+
+        await self.app(scope, receive, send)
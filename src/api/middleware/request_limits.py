@@ -0,0 +1,51 @@
+"""Request limits middleware (request body size)."""
+
+from config.settings import SecurityConfig
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class RequestLimitsMiddleware:
+    """Reject request bodies larger than SecurityConfig.MAX_REQUEST_BODY_SIZE.
+
+    The declared Content-Length is checked before the app runs. Bodies sent
+    without one (chunked) are counted as the endpoint reads them; going over
+    the limit raises a 413 HTTPException, which FastAPI lets through its body
+    parsing and turns into the response.
+    """
+
+    def __init__(self, app: ASGIApp, max_body_size: int = SecurityConfig.MAX_REQUEST_BODY_SIZE) -> None:
+        self.app = app
+        self.max_body_size = max_body_size
+        self.detail = f"Request body exceeds {max_body_size} bytes"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Declared size, read by RequestInfoMiddleware
+        if scope["state"]["content_length"] > self.max_body_size:
+            response = JSONResponse(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                content={"detail": self.detail},
+            )
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def receive_wrapper() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=self.detail,
+                    )
+            return message
+
+        await self.app(scope, receive_wrapper, send)
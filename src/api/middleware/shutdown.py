@@ -0,0 +1,41 @@
+"""Shutdown middleware for graceful shutdown and in-flight request tracking."""
+
+import orjson
+from fastapi.responses import Response
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config.lifespan import (
+    decrement_active_requests,
+    increment_active_requests,
+    is_shutting_down,
+)
+
+_SHUTTING_DOWN_BODY = orjson.dumps({"detail": "Service is shutting down"})
+
+
+class ShutdownMiddleware:
+    """Reject new requests once shutdown started and count in-flight ones."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if is_shutting_down():
+            response = Response(
+                content=_SHUTTING_DOWN_BODY,
+                status_code=503,
+                headers={"Connection": "close", "Retry-After": "5"},
+                media_type="application/json",
+            )
+            await response(scope, receive, send)
+            return
+
+        increment_active_requests()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            decrement_active_requests()
@@ -2,14 +2,141 @@
 
 import logging
 import re
-from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from config.settings import SecurityConfig, get_default_model
 from pydantic import BaseModel, Field, field_validator
+from services.security_service import (
+    incident_timestamp,
+    security_metrics,
+    trace_security_incident,
+)
 
 logger = logging.getLogger(__name__)
 
+# SUSPICIOUS_REGEX group name ("p<index>") -> source pattern, for incidents
+_PATTERN_BY_GROUP = {
+    f"p{index}": pattern
+    for index, pattern in enumerate(SecurityConfig.SUSPICIOUS_PATTERNS)
+}
+
+# Suspicious encoding sequences in prompts (matched by _find_suspicious_sequence,
+# the patterns are kept for incident reports)
+_SUSPICIOUS_SEQUENCES = [
+    (r"%[0-9a-f]{2}", "url_encoding"),
+    (r"&#x[0-9a-f]+;", "html_entity_hex"),
+    (r"&#\d+;", "html_entity_dec"),
+    (r"%u[0-9a-f]{4}", "unicode_escape"),
+]
+
+# Additional checks specific to system prompts
+_SUSPICIOUS_SYSTEM_PATTERNS = [
+    (
+        r"(?i)(override|bypass|disable).{0,20}(safety|security|guardrails|filter)",
+        "safety_override_attempt",
+    ),
+    (
+        r"(?i)(always|must|will|should).{0,10}(obey|follow|execute|comply)",
+        "command_injection_attempt",
+    ),
+    (
+        r"(?i)(you are|act as|role is|persona).{0,10}(developer|admin|root|system)",
+        "role_manipulation",
+    ),
+]
+
+
+def _fuse_patterns(patterns: List[tuple]) -> "re.Pattern[str]":
+    """Compile (pattern, type) pairs into one case-insensitive alternation.
+
+    Each pattern sits in a group named after its type, so a single scan both
+    finds a match and tells (via match.lastgroup) which pattern it was.
+    """
+    return re.compile(
+        "|".join(
+            f"(?P<{pattern_type}>{pattern.removeprefix('(?i)')})"
+            for pattern, pattern_type in patterns
+        ),
+        re.IGNORECASE,
+    )
+
+
+_SEQUENCE_BY_TYPE = {seq_type: seq for seq, seq_type in _SUSPICIOUS_SEQUENCES}
+
+_SYSTEM_PATTERNS_REGEX = _fuse_patterns(_SUSPICIOUS_SYSTEM_PATTERNS)
+_SYSTEM_PATTERN_BY_TYPE = {
+    pattern_type: pattern for pattern, pattern_type in _SUSPICIOUS_SYSTEM_PATTERNS
+}
+
+
+_HEX_DIGITS = frozenset("0123456789abcdefABCDEF")
+
+
+def _is_hex(text: str) -> bool:
+    """True if every character of text is a hex digit."""
+    return all(char in _HEX_DIGITS for char in text)
+
+
+def _first_percent_sequence(text: str) -> Optional[Tuple[int, str]]:
+    """Leftmost "%XX" (url_encoding) or "%uXXXX" (unicode_escape)."""
+    index = text.find("%")
+    while index != -1:
+        pair = text[index + 1 : index + 3]
+        if len(pair) == 2 and _is_hex(pair):
+            return index, "url_encoding"
+        if text[index + 1 : index + 2] in ("u", "U"):
+            quad = text[index + 2 : index + 6]
+            if len(quad) == 4 and _is_hex(quad):
+                return index, "unicode_escape"
+        index = text.find("%", index + 1)
+    return None
+
+
+def _first_entity_sequence(text: str) -> Optional[Tuple[int, str]]:
+    """Leftmost "&#xHH;" (html_entity_hex) or "&#DD;" (html_entity_dec)."""
+    index = text.find("&#")
+    end = len(text)
+    while index != -1:
+        start = index + 2
+        if text[start : start + 1] in ("x", "X"):
+            pos = start + 1
+            while pos < end and text[pos] in _HEX_DIGITS:
+                pos += 1
+            if pos > start + 1 and text[pos : pos + 1] == ";":
+                return index, "html_entity_hex"
+        else:
+            pos = start
+            while pos < end and text[pos].isdecimal():
+                pos += 1
+            if pos > start and text[pos : pos + 1] == ";":
+                return index, "html_entity_dec"
+        index = text.find("&#", index + 1)
+    return None
+
+
+def _find_suspicious_sequence(text: str) -> Optional[str]:
+    """Return the type of the leftmost _SUSPICIOUS_SEQUENCES match in text, if any.
+
+    Every sequence starts with "%" or "&#", so str.find jumps between those
+    anchors and only the few characters after each one are checked, instead
+    of running the regex engine over the whole prompt.
+    """
+    percent = _first_percent_sequence(text)
+    entity = _first_entity_sequence(text)
+    if percent is None:
+        return entity[1] if entity is not None else None
+    if entity is None or percent[0] < entity[0]:
+        return percent[1]
+    return entity[1]
+
+
+def _find_suspicious_pattern(text: str) -> Optional[str]:
+    """Return the SUSPICIOUS_PATTERNS entry matching text, if any (single scan)."""
+    match = SecurityConfig.SUSPICIOUS_REGEX.search(text)
+    if match is None:
+        return None
+    return _PATTERN_BY_GROUP[match.lastgroup]
+
 
 class SecurePromptRequest(BaseModel):
     prompt: str = Field(
@@ -50,7 +177,9 @@ class SecurePromptRequest(BaseModel):
         True, description="Enable content moderation"
     )
 
-    @field_validator("prompt")
+    # mode="after": pydantic-core checks the type and length constraints
+    # first, so oversized prompts are rejected before any pattern scan
+    @field_validator("prompt", mode="after")
     @classmethod
     def validate_prompt_security(cls, v: str) -> str:
         """Check for suspicious patterns in prompt with enhanced security checks."""
@@ -58,96 +187,71 @@ class SecurePromptRequest(BaseModel):
             return v
 
         # Check for suspicious patterns with enhanced detection
-        for pattern in SecurityConfig.SUSPICIOUS_PATTERNS:
-            if re.search(pattern, v, re.IGNORECASE | re.DOTALL):
-                # Lazy import to avoid circular dependency
-                try:
-                    from services.security_service import (
-                        security_metrics,
-                        trace_security_incident,
-                    )
-
-                    # Log detailed security event
-                    security_metrics["blocked_requests"] += 1
-                    incident_data = {
-                        "type": "malicious_prompt",
-                        "pattern": pattern,
-                        "snippet": v[:200] + ("..." if len(v) > 200 else ""),
-                        "timestamp": datetime.utcnow().isoformat(),
-                        "severity": "high",
-                    }
-                    security_metrics["security_incidents"].append(incident_data)
-
-                    # Trace security incident in MLflow
-                    try:
-                        trace_security_incident(
-                            incident_type="malicious_prompt",
-                            request_data={"prompt": v, "field": "prompt"},
-                            pattern=pattern,
-                            error_message="Potentially malicious pattern detected in prompt",
-                        )
-                    except Exception as trace_error:
-                        logger.warning(
-                            f"Warning: Could not trace security incident: {trace_error}"
-                        )
-
-                except ImportError:
-                    logger.warning("Could not import security service for logging")
-
-                raise ValueError("Potentially malicious pattern detected in prompt")
+        pattern = _find_suspicious_pattern(v)
+        if pattern is not None:
+            # Log detailed security event
+            security_metrics["blocked_requests"] += 1
+            incident_data = {
+                "type": "malicious_prompt",
+                "pattern": pattern,
+                "snippet": v if len(v) <= 200 else v[:200] + "...",
+                "timestamp": incident_timestamp(),
+                "severity": "high",
+            }
+            security_metrics["security_incidents"].append(incident_data)
+
+            # Trace security incident in MLflow
+            try:
+                trace_security_incident(
+                    incident_type="malicious_prompt",
+                    request_data={"prompt": v, "field": "prompt"},
+                    pattern=pattern,
+                    error_message="Potentially malicious pattern detected in prompt",
+                )
+            except Exception as trace_error:
+                logger.warning(
+                    f"Warning: Could not trace security incident: {trace_error}"
+                )
+
+            raise ValueError("Potentially malicious pattern detected in prompt")
 
         # Check for suspicious encoding sequences
-        suspicious_sequences = [
-            (r"%[0-9a-f]{2}", "url_encoding"),
-            (r"&#x[0-9a-f]+;", "html_entity_hex"),
-            (r"&#\d+;", "html_entity_dec"),
-            (r"%u[0-9a-f]{4}", "unicode_escape"),
-        ]
-
-        for seq, seq_type in suspicious_sequences:
-            if re.search(seq, v, re.IGNORECASE):
-                try:
-                    from services.security_service import (
-                        security_metrics,
-                        trace_security_incident,
-                    )
-
-                    security_metrics["blocked_requests"] += 1
-                    incident_data = {
-                        "type": "suspicious_encoding",
-                        "pattern": seq,
+        seq_type = _find_suspicious_sequence(v)
+        if seq_type is not None:
+            seq = _SEQUENCE_BY_TYPE[seq_type]
+            security_metrics["blocked_requests"] += 1
+            incident_data = {
+                "type": "suspicious_encoding",
+                "pattern": seq,
+                "encoding_type": seq_type,
+                "snippet": v if len(v) <= 200 else v[:200] + "...",
+                "timestamp": incident_timestamp(),
+                "severity": "medium",
+            }
+            security_metrics["security_incidents"].append(incident_data)
+
+            # Trace security incident in MLflow
+            try:
+                trace_security_incident(
+                    incident_type="suspicious_encoding",
+                    request_data={
+                        "prompt": v,
+                        "field": "prompt",
                         "encoding_type": seq_type,
-                        "snippet": v[:200] + ("..." if len(v) > 200 else ""),
-                        "timestamp": datetime.utcnow().isoformat(),
-                        "severity": "medium",
-                    }
-                    security_metrics["security_incidents"].append(incident_data)
-
-                    # Trace security incident in MLflow
-                    try:
-                        trace_security_incident(
-                            incident_type="suspicious_encoding",
-                            request_data={
-                                "prompt": v,
-                                "field": "prompt",
-                                "encoding_type": seq_type,
-                            },
-                            pattern=seq,
-                            error_message=f"Suspicious {seq_type} encoding detected in prompt",
-                        )
-                    except Exception as trace_error:
-                        logger.warning(
-                            f"Warning: Could not trace security incident: {trace_error}"
-                        )
-
-                except ImportError:
-                    logger.warning("Could not import security service for logging")
-
-                raise ValueError(f"Suspicious {seq_type} encoding detected in prompt")
+                    },
+                    pattern=seq,
+                    error_message=f"Suspicious {seq_type} encoding detected in prompt",
+                )
+            except Exception as trace_error:
+                logger.warning(
+                    f"Warning: Could not trace security incident: {trace_error}"
+                )
+
+            raise ValueError(f"Suspicious {seq_type} encoding detected in prompt")
 
         return v
 
-    @field_validator("system_prompt")
+    @field_validator("system_prompt", mode="after")
     @classmethod
     def validate_system_prompt_security(cls, v: Optional[str]) -> Optional[str]:
         """Check for suspicious patterns in system prompt with enhanced security checks."""
@@ -155,104 +259,73 @@ class SecurePromptRequest(BaseModel):
             return v
 
         # Check for suspicious patterns with enhanced detection
-        for pattern in SecurityConfig.SUSPICIOUS_PATTERNS:
-            if re.search(pattern, v, re.IGNORECASE | re.DOTALL):
-                try:
-                    from services.security_service import (
-                        security_metrics,
-                        trace_security_incident,
-                    )
-
-                    # Log detailed security event
-                    security_metrics["blocked_requests"] += 1
-                    incident_data = {
-                        "type": "malicious_system_prompt",
-                        "pattern": pattern,
-                        "snippet": v[:200] + ("..." if len(v) > 200 else ""),
-                        "timestamp": datetime.utcnow().isoformat(),
-                        "severity": "critical",  # Higher severity for system prompt tampering
-                    }
-                    security_metrics["security_incidents"].append(incident_data)
-
-                    # Trace security incident in MLflow
-                    try:
-                        trace_security_incident(
-                            incident_type="malicious_system_prompt",
-                            request_data={"system_prompt": v, "field": "system_prompt"},
-                            pattern=pattern,
-                            error_message="Potentially malicious pattern detected in system prompt",
-                        )
-                    except Exception as trace_error:
-                        logger.warning(
-                            f"Warning: Could not trace security incident: {trace_error}"
-                        )
-
-                except ImportError:
-                    logger.warning("Could not import security service for logging")
-
-                raise ValueError(
-                    "Potentially malicious pattern detected in system prompt"
+        pattern = _find_suspicious_pattern(v)
+        if pattern is not None:
+            # Log detailed security event
+            security_metrics["blocked_requests"] += 1
+            incident_data = {
+                "type": "malicious_system_prompt",
+                "pattern": pattern,
+                "snippet": v if len(v) <= 200 else v[:200] + "...",
+                "timestamp": incident_timestamp(),
+                "severity": "critical",  # Higher severity for system prompt tampering
+            }
+            security_metrics["security_incidents"].append(incident_data)
+
+            # Trace security incident in MLflow
+            try:
+                trace_security_incident(
+                    incident_type="malicious_system_prompt",
+                    request_data={"system_prompt": v, "field": "system_prompt"},
+                    pattern=pattern,
+                    error_message="Potentially malicious pattern detected in system prompt",
+                )
+            except Exception as trace_error:
+                logger.warning(
+                    f"Warning: Could not trace security incident: {trace_error}"
                 )
 
+            raise ValueError(
+                "Potentially malicious pattern detected in system prompt"
+            )
+
         # Additional checks specific to system prompts
-        suspicious_system_patterns = [
-            (
-                r"(?i)(override|bypass|disable).{0,20}(safety|security|guardrails|filter)",
-                "safety_override_attempt",
-            ),
-            (
-                r"(?i)(always|must|will|should).{0,10}(obey|follow|execute|comply)",
-                "command_injection_attempt",
-            ),
-            (
-                r"(?i)(you are|act as|role is|persona).{0,10}(developer|admin|root|system)",
-                "role_manipulation",
-            ),
-        ]
-
-        for pattern, pattern_type in suspicious_system_patterns:
-            if re.search(pattern, v, re.IGNORECASE):
-                try:
-                    from services.security_service import (
-                        security_metrics,
-                        trace_security_incident,
-                    )
-
-                    security_metrics["blocked_requests"] += 1
-                    incident_data = {
-                        "type": "suspicious_system_prompt",
-                        "pattern": pattern,
+        match = _SYSTEM_PATTERNS_REGEX.search(v)
+        if match is not None:
+            pattern_type = match.lastgroup
+            pattern = _SYSTEM_PATTERN_BY_TYPE[pattern_type]
+            security_metrics["blocked_requests"] += 1
+            incident_data = {
+                "type": "suspicious_system_prompt",
+                "pattern": pattern,
+                "pattern_type": pattern_type,
+                "snippet": v if len(v) <= 200 else v[:200] + "...",
+                "timestamp": incident_timestamp(),
+                "severity": "high",
+            }
+            security_metrics["security_incidents"].append(incident_data)
+
+            # Trace security incident in MLflow
+            try:
+                trace_security_incident(
+                    incident_type="suspicious_system_prompt",
+                    request_data={
+                        "system_prompt": v,
+                        "field": "system_prompt",
                         "pattern_type": pattern_type,
-                        "snippet": v[:200] + ("..." if len(v) > 200 else ""),
-                        "timestamp": datetime.utcnow().isoformat(),
-                        "severity": "high",
-                    }
-                    security_metrics["security_incidents"].append(incident_data)
-
-                    # Trace security incident in MLflow
-                    try:
-                        trace_security_incident(
-                            incident_type="suspicious_system_prompt",
-                            request_data={
-                                "system_prompt": v,
-                                "field": "system_prompt",
-                                "pattern_type": pattern_type,
-                            },
-                            pattern=pattern,
-                            error_message=f"Suspicious system prompt pattern detected: {pattern_type}",
-                        )
-                    except Exception as trace_error:
-                        logger.warning(
-                            f"Warning: Could not trace security incident: {trace_error}"
-                        )
-
-                except ImportError:
-                    logger.warning("Could not import security service for logging")
-
-                raise ValueError(
-                    f"Suspicious system prompt pattern detected: {pattern_type}"
+                    },
+                    pattern=pattern,
+                    error_message=f"Suspicious system prompt pattern detected: {pattern_type}",
+                )
+            except Exception as trace_error:
+                logger.warning(
+                    f"Warning: Could not trace security incident: {trace_error}"
                 )
 
+            raise ValueError(
+                f"Suspicious system prompt pattern detected: {pattern_type}"
+            )
+
         return v
 
 
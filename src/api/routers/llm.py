@@ -19,25 +19,48 @@ Students should:
 - Add incident IDs for error tracking
 """
 
+import asyncio
+import logging
 import time
-from typing import Any, Dict
+from functools import partial
+from typing import Any, Dict, Optional
 
+import httpx
 import openai
-import requests
 from litellm import completion_cost
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.responses import ORJSONResponse
 from models.llm_models import ModelsResponse, SecurePromptRequest, SecurePromptResponse
 from services.auth_service import verify_token
+from services.litellm_client import get_models_json
 from services.mlflow_service import mlflow_service
 from services.security_service import security_metrics
 from config.settings import settings
 from cache.exact_cache import ExactCache
+from metrics.llm_metrics import LLM_INFLIGHT, record_speculative_call
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/llm", tags=["llm"])
 
+# MLflow traces are queued and recorded by a background worker, off the
+# response path. Once the queue is full new traces are dropped instead of piling up.
+TRACE_QUEUE_SIZE = 1000
+_trace_queue: asyncio.Queue = asyncio.Queue(maxsize=TRACE_QUEUE_SIZE)
+_trace_worker_task: Optional[asyncio.Task] = None
+
+# Backpressure: at most MAX_CONCURRENT_LLM_REQUESTS generations at once, the
+# others wait up to LLM_QUEUE_TIMEOUT_SECONDS for a slot and then get a 429
+LLM_QUEUE_TIMEOUT_SECONDS = 30
+_generate_slots = asyncio.Semaphore(settings.MAX_CONCURRENT_LLM_REQUESTS)
+
+# LLM calls in progress, by exact cache key (see _complete_once)
+_inflight: Dict[str, asyncio.Task] = {}
+
 # TODO Exercise 3: No timeout configured! This can hang forever!
-client = openai.OpenAI(
+# Async client: the LLM call awaits the socket instead of blocking the event loop
+client = openai.AsyncOpenAI(
     base_url=f"{settings.LITELLM_URL}/v1",
     api_key="dummy-key"  # LiteLLM handles the real API keys
 )
@@ -46,23 +69,131 @@ client = openai.OpenAI(
 cache = ExactCache(
     qdrant_url=settings.QDRANT_URL,
     ttl_seconds=1800,
+    grpc_port=settings.QDRANT_GRPC_PORT,
 )
 
 
+async def _trace_worker():
+    """Record the queued MLflow traces one by one, in a worker thread."""
+    while True:
+        trace_kwargs = await _trace_queue.get()
+        try:
+            await asyncio.to_thread(mlflow_service.trace_llm_request, **trace_kwargs)
+        except Exception as e:
+            logger.warning("Could not trace LLM request: %s", e)
+        finally:
+            _trace_queue.task_done()
+
+
+def start_trace_worker():
+    """Start the MLflow trace worker (called at startup)."""
+    global _trace_worker_task
+    if _trace_worker_task is None:
+        _trace_worker_task = asyncio.create_task(_trace_worker())
+
+
+async def stop_trace_worker():
+    """Record the traces still queued, then stop the worker (called at shutdown)."""
+    if _trace_worker_task is None:
+        return
+    try:
+        await _trace_queue.join()
+    finally:
+        _trace_worker_task.cancel()
+
+
+def _trace_in_background(**trace_kwargs):
+    """Queue an MLflow trace for the worker without waiting for it."""
+    try:
+        _trace_queue.put_nowait(trace_kwargs)
+    except asyncio.QueueFull:
+        logger.warning("MLflow trace queue full, dropping trace")
+
+
+async def _complete(
+    litellm_params: Dict[str, Any], full_prompt: str, model: str, cache_key: str
+) -> Dict[str, Any]:
+    """Call the LLM, store the result in the exact cache and return it."""
+    response = await client.chat.completions.create(**litellm_params)
+
+    prompt_tokens = response.usage.prompt_tokens
+    completion_tokens = response.usage.completion_tokens
+
+    try:
+        actual_model = getattr(response, "model", None) or model
+        cost = completion_cost(completion_response=response, model=actual_model)
+    except Exception as e:
+        logger.warning("Could not calculate cost: %s", e)
+        cost = (prompt_tokens * 0.00001) + (completion_tokens * 0.00002)
+
+    result = {
+        "response": response.choices[0].message.content,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": response.usage.total_tokens,
+        "cost": cost,
+        "guardrails_triggered": [],
+    }
+    cache.set(prompt=full_prompt, model=model, response=result, key=cache_key)
+    return result
+
+
+def _forget_inflight(cache_key: str, task: asyncio.Task):
+    if _inflight.get(cache_key) is task:
+        del _inflight[cache_key]
+
+
+async def _complete_once(
+    litellm_params: Dict[str, Any], full_prompt: str, model: str, cache_key: str
+) -> Dict[str, Any]:
+    """
+    _complete, shared by concurrent requests for the same cache key.
+
+    The first cache miss starts the LLM call; identical requests arriving
+    before it finishes await the same task instead of calling the LLM again.
+    """
+    task = _inflight.get(cache_key)
+    if task is None:
+        task = asyncio.create_task(
+            _complete(litellm_params, full_prompt, model, cache_key)
+        )
+        _inflight[cache_key] = task
+        task.add_done_callback(partial(_forget_inflight, cache_key))
+    # shield: one caller going away must not cancel the call for the others
+    return await asyncio.shield(task)
+
+
 @router.post("/generate", response_model=SecurePromptResponse)
 async def generate_secure_prompt(
     request: SecurePromptRequest,
     current_user: Dict[str, Any] = Depends(verify_token)
 ):
     """Generate text using LLM with built-in security guardrails."""
+    # Wall clock for MLflow's start timestamp, perf_counter for the duration
     start_time = time.time()
+    start_perf = time.perf_counter()
+
+    try:
+        await asyncio.wait_for(
+            _generate_slots.acquire(), timeout=LLM_QUEUE_TIMEOUT_SECONDS
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many generation requests in progress, retry later",
+            headers={"Retry-After": "5"},
+        )
+    LLM_INFLIGHT.inc()
 
     try:
         # Prepare messages for the LLM
-        messages = []
+        user_message = {"role": "user", "content": request.prompt}
         if request.system_prompt:
-            messages.append({"role": "system", "content": request.system_prompt})
-        messages.append({"role": "user", "content": request.prompt})
+            messages = [{"role": "system", "content": request.system_prompt}, user_message]
+            full_prompt = f"{request.system_prompt}\n{request.prompt}"
+        else:
+            messages = [user_message]
+            full_prompt = request.prompt
 
         # Prepare request parameters
         litellm_params = {
@@ -75,91 +206,95 @@ async def generate_secure_prompt(
         if request.response_format:
             litellm_params["response_format"] = request.response_format
 
-        print(f"DEBUG: Making LiteLLM request with model: {request.model}")
-
-        # Create cache key from full prompt
-        full_prompt = "\n".join([msg["content"] for msg in messages])
+        logger.debug("Making LiteLLM request with model: %s", request.model)
 
-        # Try exact cache first
-        cached_response = cache.get(
-            prompt=full_prompt,
-            model=request.model,
+        # Create cache key from full prompt (all message contents, one per line),
+        # once for the lookup, the in-flight map and the cache write
+        cache_key = cache.make_key(
+            full_prompt,
+            request.model,
             temperature=request.temperature,
             max_tokens=request.max_tokens,
         )
 
+        # With SPECULATE_ON_CACHE_MISS the LLM call starts during the Qdrant
+        # lookup, so a miss doesn't wait for the lookup first. Hits from the
+        # in-process front cache are checked before and never start a call
+        llm_task = None
+        cached_response = None
+        if settings.SPECULATE_ON_CACHE_MISS:
+            cached_response = cache.get_local(cache_key)
+            if cached_response is None:
+                llm_task = asyncio.create_task(
+                    _complete_once(litellm_params, full_prompt, request.model, cache_key)
+                )
+
+        # Try exact cache first
+        if cached_response is None:
+            cached_response = await cache.get(
+                prompt=full_prompt, model=request.model, key=cache_key
+            )
+
         if cached_response:
-            print("Exact cache hit")
-            response_text = cached_response["response"]
-            prompt_tokens = cached_response["prompt_tokens"]
-            completion_tokens = cached_response["completion_tokens"]
-            total_tokens = cached_response["total_tokens"]
-            cost = cached_response["cost"]
-            guardrails_triggered = cached_response.get("guardrails_triggered", [])
+            logger.debug("Exact cache hit")
+            result = cached_response
+            if llm_task is not None:
+                # Stops waiting for it; the shared call itself still finishes
+                # (other requests may await it) and refreshes the cache entry
+                llm_task.cancel()
+                record_speculative_call(used=False)
+        elif llm_task is not None:
+            result = await llm_task
+            record_speculative_call(used=True)
         else:
-            response = client.chat.completions.create(**litellm_params)
-
-            response_text = response.choices[0].message.content
-            prompt_tokens = response.usage.prompt_tokens
-            completion_tokens = response.usage.completion_tokens
-            total_tokens = response.usage.total_tokens
-
-            try:
-                actual_model = response.model if hasattr(response, "model") else request.model
-                cost = completion_cost(completion_response=response, model=actual_model)
-            except Exception as e:
-                print(f"Warning: Could not calculate cost: {e}")
-                cost = (prompt_tokens * 0.00001) + (completion_tokens * 0.00002)
-
-            guardrails_triggered = []
-
-            cache.set(
-                prompt=full_prompt,
-                model=request.model,
-                response={
-                    "response": response_text,
-                    "prompt_tokens": prompt_tokens,
-                    "completion_tokens": completion_tokens,
-                    "total_tokens": total_tokens,
-                    "cost": cost,
-                    "guardrails_triggered": guardrails_triggered,
-                },
-                temperature=request.temperature,
-                max_tokens=request.max_tokens,
+            result = await _complete_once(
+                litellm_params, full_prompt, request.model, cache_key
             )
 
-        # Trace in MLflow
-        try:
-            mlflow_service.trace_llm_request(
-                prompt=request.prompt,
-                model=request.model,
-                response=response_text,
-                tokens={"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": total_tokens},
-                cost=cost,
-                start_time=start_time,
-                cache_hit=cached_response is not None,
-            )
-        except Exception as e:
-            # TODO Exercise 4: Silent failure - no fallback logging!
-            print(f"Warning: Could not trace LLM request: {e}")
+        response_text = result["response"]
+        prompt_tokens = result["prompt_tokens"]
+        completion_tokens = result["completion_tokens"]
+        total_tokens = result["total_tokens"]
+        cost = result["cost"]
+        guardrails_triggered = result.get("guardrails_triggered", [])
 
-        return SecurePromptResponse(
-            response=response_text,
+        # Trace in MLflow (in the background, the response doesn't wait for it)
+        _trace_in_background(
+            prompt=request.prompt,
             model=request.model,
-            prompt_tokens=prompt_tokens,
-            completion_tokens=completion_tokens,
-            total_tokens=total_tokens,
+            response=response_text,
+            tokens={"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": total_tokens},
             cost=cost,
-            security_status="protected",
-            guardrails_triggered=guardrails_triggered,
+            start_time=start_time,
+            end_time=start_time + (time.perf_counter() - start_perf),
+            cache_hit=cached_response is not None,
+        )
+
+        # Values come from the LLM client or our own cache entries: returned
+        # as a response, FastAPI sends them without validating them against
+        # response_model again (which only documents the schema here)
+        return ORJSONResponse(
+            content={
+                "response": response_text,
+                "model": request.model,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": total_tokens,
+                "cost": cost,
+                "security_status": "protected",
+                "guardrails_triggered": guardrails_triggered,
+            }
         )
 
     except Exception as e:
-        print(f"Error generating response: {e}")
+        logger.error("Error generating response: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to generate response"
         )
+    finally:
+        LLM_INFLIGHT.dec()
+        _generate_slots.release()
 
 
 # Cache management endpoints
@@ -167,7 +302,7 @@ async def generate_secure_prompt(
 async def get_cache_stats(current_user: Dict[str, Any] = Depends(verify_token)):
     """Get cache statistics."""
     try:
-        stats = cache.get_cache_stats()
+        stats = await cache.get_cache_stats()
         return {"status": "success", "data": stats}
     except Exception as e:
         raise HTTPException(
@@ -183,7 +318,7 @@ async def clear_cache(
 ):
     """Clear cache collections."""
     try:
-        success = cache.clear_cache(cache_type)
+        success = await cache.clear_cache(cache_type)
         if success:
             return {
                 "status": "success",
@@ -201,31 +336,25 @@ async def clear_cache(
         )
 
 
+# /v1/models is the OpenAI-compatible alias, served by the same handler
 @router.get("/models", response_model=ModelsResponse)
+@router.get("/v1/models", response_model=ModelsResponse)
 async def list_models():
-    """List all available models from the LiteLLM router."""
+    """List all available models from the LiteLLM router (cached for a short TTL)."""
     try:
-        response = requests.get(f"{settings.LITELLM_URL}/models", timeout=5)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.Timeout:
+        return Response(content=await get_models_json(), media_type="application/json")
+    except httpx.TimeoutException:
         raise HTTPException(
             status_code=status.HTTP_504_GATEWAY_TIMEOUT,
             detail="Timeout fetching models from LiteLLM",
         )
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
             detail=f"Error fetching models: {e}",
         )
 
 
-@router.get("/v1/models", response_model=ModelsResponse)
-async def list_models_v1():
-    """OpenAI-compatible models endpoint for better API compatibility."""
-    return await list_models()
-
-
 @router.get("/health")
 async def llm_health():
     """LLM service health check."""
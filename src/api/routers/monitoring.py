@@ -13,8 +13,11 @@ from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import Response
 from prometheus_client import (
     CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
     Gauge,
     generate_latest,
+    multiprocess,
 )
 
 # Configure logging
@@ -36,24 +39,40 @@ from metrics.cache_metrics import (
     CACHE_HITS,
     CACHE_LATENCY,
     CACHE_SIMILARITY_SCORE,
-    CACHE_SIMILARITY_QUALITY,
     CACHE_HIT_RATIO,
     CACHE_PERFORMANCE_SAVINGS,
-    CACHE_AVG_SEMANTIC_SIMILARITY,
     record_cache_hit,
     record_cache_miss,
-    update_cache_ratio,
     record_performance_savings,
     record_semantic_similarity,
 )
 
-# Additional monitoring-specific metrics
-LLM_COST = Gauge("llmops_llm_cost_total", "Total LLM cost in USD")
-LLM_TOKENS = Gauge("llmops_llm_tokens_total", "Total tokens used", ["type", "model"])
+# Additional monitoring-specific metrics (computed from MLflow, identical in
+# every worker, hence "max" in multiprocess mode)
+LLM_COST = Gauge("llmops_llm_cost_total", "Total LLM cost in USD", multiprocess_mode="max")
+LLM_TOKENS = Gauge(
+    "llmops_llm_tokens_total", "Total tokens used", ["type", "model"], multiprocess_mode="max"
+)
 SEMANTIC_SIMILARITY_AVG = Gauge(
-    "llmops_semantic_similarity_average", "Average semantic similarity score"
+    "llmops_semantic_similarity_average",
+    "Average semantic similarity score",
+    multiprocess_mode="max",
 )
 
+# Set when uvicorn runs several workers: each process writes its samples to
+# this directory and /metrics merges them, instead of exposing whichever
+# worker happened to answer the scrape
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+
+def _metrics_registry():
+    """Registry to expose: a per-scrape multiprocess merge, or the default one."""
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
 # Basic API monitoring metrics (these already exist in middleware, just reusing them here)
 # REQUEST_COUNT, REQUEST_DURATION, etc. are imported from middleware
 
@@ -77,7 +96,7 @@ async def get_prometheus_metrics():
             logger.warning(f"Cache metrics update failed: {cache_error}")
 
         # Generate Prometheus format with fallback
-        metrics_content = generate_latest()
+        metrics_content = generate_latest(_metrics_registry())
         if not metrics_content:
             logger.warning("Generated empty metrics content")
             metrics_content = "# No metrics available\n"
@@ -208,15 +227,6 @@ async def generate_test_cache_metrics():
         CACHE_SIMILARITY_SCORE.observe(0.78)  # Fair
         CACHE_SIMILARITY_SCORE.observe(0.72)  # Poor
 
-        # Generate similarity quality counter data for the dashboard
-        CACHE_SIMILARITY_QUALITY.labels(quality="excellent").inc(15)  # >=0.95
-        CACHE_SIMILARITY_QUALITY.labels(quality="good").inc(12)  # 0.85-0.94
-        CACHE_SIMILARITY_QUALITY.labels(quality="fair").inc(8)  # 0.75-0.84
-        CACHE_SIMILARITY_QUALITY.labels(quality="poor").inc(3)  # <0.75
-
-        # Set the semantic similarity average metric that the dashboard expects
-        CACHE_AVG_SEMANTIC_SIMILARITY.set(0.87)  # 87% average similarity
-
         return {
             "message": "Test cache metrics generated successfully",
             "metrics": {
@@ -13,9 +13,10 @@ Students should:
 """
 
 from datetime import datetime
+from itertools import islice
 
 from config.settings import SecurityConfig, settings
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
 from services.security_service import security_metrics
 
 router = APIRouter(prefix="/system", tags=["system"])
@@ -180,10 +181,12 @@ async def get_cache_metrics():
 @router.get("/security-incidents")
 async def get_security_incidents(limit: int = Query(50, ge=1, le=1000)):
     """Get detailed security incidents for analysis."""
-    recent_incidents = security_metrics["security_incidents"][-limit:]
+    # The incidents ring buffer is a deque, which has no slicing
+    incidents = security_metrics["security_incidents"]
+    recent_incidents = list(islice(incidents, max(len(incidents) - limit, 0), None))
 
     return {
-        "total_incidents": len(security_metrics["security_incidents"]),
+        "total_incidents": len(incidents),
         "showing_recent": len(recent_incidents),
         "incidents": recent_incidents,
         "incident_types": (
@@ -0,0 +1,100 @@
+"""Dependency health checks for the readiness endpoint."""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import httpx
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HealthResult:
+    """Outcome of a single dependency check."""
+
+    healthy: bool
+    latency_ms: Optional[float] = None
+    message: str = ""
+
+
+class HealthChecker:
+    """Run all dependency checks concurrently and briefly cache the result."""
+
+    def __init__(self, timeout_seconds: float = 2.0, cache_ttl_seconds: float = 1.0):
+        self.timeout = timeout_seconds
+        self.cache_ttl = cache_ttl_seconds
+        self.checks: Dict[str, str] = {
+            "qdrant": f"{settings.QDRANT_URL}/healthz",
+            "litellm": f"{settings.LITELLM_URL}/health/liveliness",
+            "mlflow": f"{settings.MLFLOW_TRACKING_URI}/health",
+        }
+        self._client = httpx.AsyncClient(timeout=timeout_seconds)
+        self._cached: Optional[Dict[str, HealthResult]] = None
+        self._cached_at = 0.0
+        self._in_flight: Optional[asyncio.Task] = None
+
+    async def _check(self, url: str) -> HealthResult:
+        """Probe a single dependency over HTTP."""
+        start = time.perf_counter()
+        try:
+            response = await self._client.get(url)
+        except httpx.HTTPError as e:
+            latency_ms = (time.perf_counter() - start) * 1000
+            return HealthResult(False, latency_ms, f"{type(e).__name__}: {e}")
+
+        latency_ms = (time.perf_counter() - start) * 1000
+        if response.status_code < 400:
+            return HealthResult(True, latency_ms, "ok")
+        return HealthResult(False, latency_ms, f"HTTP {response.status_code}")
+
+    async def _run_checks(self) -> Dict[str, HealthResult]:
+        """Run every check in parallel, each bounded by the check timeout."""
+        names = list(self.checks)
+        outcomes = await asyncio.gather(
+            *(asyncio.wait_for(self._check(url), self.timeout) for url in self.checks.values()),
+            return_exceptions=True,
+        )
+
+        results = {}
+        for name, outcome in zip(names, outcomes):
+            if isinstance(outcome, asyncio.TimeoutError):
+                results[name] = HealthResult(False, self.timeout * 1000, "timeout")
+            elif isinstance(outcome, Exception):
+                logger.warning("Health check for %s failed: %s", name, outcome)
+                results[name] = HealthResult(False, None, str(outcome))
+            else:
+                results[name] = outcome
+
+        self._cached = results
+        self._cached_at = time.monotonic()
+        return results
+
+    async def check_all(self, use_cache: bool = True) -> Dict[str, HealthResult]:
+        """
+        Check all dependencies.
+
+        With use_cache, a result younger than cache_ttl is reused. Concurrent
+        callers share a single in-flight run instead of probing again.
+        """
+        if (
+            use_cache
+            and self._cached is not None
+            and time.monotonic() - self._cached_at < self.cache_ttl
+        ):
+            return self._cached
+
+        if self._in_flight is None or self._in_flight.done():
+            self._in_flight = asyncio.create_task(self._run_checks())
+        return await asyncio.shield(self._in_flight)
+
+    async def close(self):
+        """Close the underlying HTTP client."""
+        await self._client.aclose()
+
+
+# Global health checker instance
+health_checker = HealthChecker()
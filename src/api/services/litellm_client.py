@@ -0,0 +1,55 @@
+"""Shared HTTP client for talking to the LiteLLM proxy."""
+
+import asyncio
+import time
+
+import httpx
+from config.settings import settings
+
+# How long the upstream /models listing is served from memory
+MODELS_CACHE_TTL_SECONDS = 30
+
+# One pooled keep-alive client for the whole process (closed in lifespan shutdown)
+litellm_client = httpx.AsyncClient(
+    base_url=settings.LITELLM_URL,
+    http2=True,
+    timeout=5.0,
+    # Keep idle connections around long enough to be reused between bursts
+    limits=httpx.Limits(
+        max_connections=100,
+        max_keepalive_connections=50,
+        keepalive_expiry=30.0,
+    ),
+)
+
+# Raw /models body from LiteLLM and its expiry (monotonic clock)
+_models_cache = {"expires_at": 0.0, "body": b""}
+_models_lock = asyncio.Lock()
+
+
+async def get_models_json() -> bytes:
+    """
+    Return the LiteLLM /models listing as JSON bytes, cached for a short TTL.
+
+    Concurrent callers that find the cache stale wait on a single refresh
+    instead of all hitting the upstream.
+    """
+    if time.monotonic() < _models_cache["expires_at"]:
+        return _models_cache["body"]
+
+    async with _models_lock:
+        # Another caller may have refreshed while we waited for the lock
+        if time.monotonic() < _models_cache["expires_at"]:
+            return _models_cache["body"]
+
+        response = await litellm_client.get("/models")
+        response.raise_for_status()
+        # Upstream JSON passed through as-is, no decode/re-encode
+        _models_cache["body"] = response.content
+        _models_cache["expires_at"] = time.monotonic() + MODELS_CACHE_TTL_SECONDS
+        return _models_cache["body"]
+
+
+async def close_litellm_client():
+    """Close the shared LiteLLM client and its pooled connections."""
+    await litellm_client.aclose()
@@ -149,6 +149,7 @@ class MLflowService:
         similarity_score: Optional[float] = None,
         response_headers: Optional[Dict[str, str]] = None,
         response_metadata: Optional[Dict[str, Any]] = None,
+        end_time: Optional[float] = None,
     ):
         """Trace LLM generation requests with enhanced cache differentiation.
 
@@ -165,6 +166,8 @@ class MLflowService:
             similarity_score: Similarity score for semantic cache hits (0-1)
             response_headers: Optional response headers
             response_metadata: Optional response metadata
+            end_time: Request end timestamp (defaults to now, set it when
+                the trace is recorded after the response was sent)
         """
         try:
             logger.debug(f"Starting MLflow trace for model: {model}")
@@ -172,7 +175,7 @@ class MLflowService:
             logger.debug(f"Current experiment: {self.experiment_name}")
 
             current_span = mlflow.get_current_active_span()
-            current_time = time.time()
+            current_time = end_time if end_time is not None else time.time()
             duration_ms = (current_time - start_time) * 1000
 
             logger.debug(f"Current span: {current_span}")
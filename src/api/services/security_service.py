@@ -1,15 +1,16 @@
 """Security service for tracking metrics and incidents."""
 
-from collections import defaultdict
-from datetime import datetime
+from collections import deque
+from datetime import datetime, timezone
 
 from services.mlflow_service import mlflow_service
 
-# Rate limiting storage (in production, use Redis)
-rate_limit_storage = defaultdict(list)
+# Rate limiting storage (in production, use Redis): sliding window counter per
+# IP, {"window_start": minute index, "curr": count, "prev": previous count}
+rate_limit_storage = {}
 
 # Security metrics storage (in production, use proper database)
-MAX_INCIDENTS = 1000  # cap to prevent unbounded memory growth
+MAX_INCIDENTS = 1000  # ring buffer size, bounds memory under sustained attacks
 security_metrics = {
     "total_requests": 0,
     "blocked_requests": 0,
@@ -17,11 +18,20 @@ security_metrics = {
     "content_moderation_triggered": 0,
     "rate_limit_violations": 0,
     "validation_failures": 0,
-    "security_incidents": [],
+    "security_incidents": deque(maxlen=MAX_INCIDENTS),
     "last_reset": datetime.now(),
 }
 
 
+def incident_timestamp() -> str:
+    """UTC time of an incident as a naive ISO string.
+
+    Same format as datetime.utcnow().isoformat() (deprecated), since
+    /system/security-status compares it to a naive UTC now.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None).isoformat()
+
+
 def trace_security_incident(
     incident_type: str,
     request_data: dict,
@@ -29,12 +39,8 @@ def trace_security_incident(
     error_message: str = None,
 ):
     """Trace security incidents in MLflow for blocked attacks."""
-    # Append with cap to avoid unbounded memory usage
-    incidents = security_metrics["security_incidents"]
-    if len(incidents) >= MAX_INCIDENTS:
-        # drop oldest entry
-        incidents.pop(0)
-    incidents.append(
+    # Bounded deque: the oldest entry is dropped once MAX_INCIDENTS is reached
+    security_metrics["security_incidents"].append(
         {
             "type": incident_type,
             "data": request_data,
@@ -63,6 +69,6 @@ def reset_security_metrics():
         "content_moderation_triggered": 0,
         "rate_limit_violations": 0,
         "validation_failures": 0,
-        "security_incidents": [],
+        "security_incidents": deque(maxlen=MAX_INCIDENTS),
         "last_reset": datetime.now(),
     }
@@ -4,12 +4,24 @@ import logging
 
 from fastapi import Request
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
+from fastapi.utils import is_body_allowed_for_status_code
 from services.security_service import security_metrics, trace_security_incident
+from starlette.exceptions import HTTPException as StarletteHTTPException
 
 logger = logging.getLogger(__name__)
 
 
+async def http_exception_handler(request: Request, exc: StarletteHTTPException):
+    """Same responses as FastAPI's default HTTPException handler, serialized with orjson."""
+    headers = getattr(exc, "headers", None)
+    if not is_body_allowed_for_status_code(exc.status_code):
+        return Response(status_code=exc.status_code, headers=headers)
+    return ORJSONResponse(
+        status_code=exc.status_code, content={"detail": exc.detail}, headers=headers
+    )
+
+
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     """Handle Pydantic validation errors and trace security-relevant ones in MLflow."""
     logger.debug(f"Validation error: {exc.errors()}")
@@ -65,4 +77,4 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
                 logger.warning(f"Could not trace validation error: {trace_error}")
 
     # Return the validation error response
-    return JSONResponse(status_code=422, content={"detail": exc.errors()})
+    return ORJSONResponse(status_code=422, content={"detail": exc.errors()})
@@ -0,0 +1,7 @@
+"""Shared fixtures for unit tests: make the API modules importable."""
+
+import sys
+from pathlib import Path
+
+# The API uses flat imports (config.settings, middleware.probes, ...)
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src" / "api"))
@@ -0,0 +1,68 @@
+"""Tests for the health probe bypass."""
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from middleware.probes import ProbeBypassMiddleware
+from starlette.middleware.exceptions import ExceptionMiddleware
+
+
+def _make_client():
+    """App wired like create_app: bypass to the router + exception handlers."""
+    app = FastAPI()
+    full_stack_paths = []
+
+    @app.get("/health")
+    async def health():
+        return {"status": "alive"}
+
+    @app.get("/health/detailed")
+    async def health_detailed():
+        raise HTTPException(status_code=503, detail="degraded")
+
+    @app.middleware("http")
+    async def record_full_stack(request, call_next):
+        full_stack_paths.append((request.method, request.url.path))
+        return await call_next(request)
+
+    probe_app = ExceptionMiddleware(app.router, handlers=app.exception_handlers)
+    app.add_middleware(ProbeBypassMiddleware, probe_app=probe_app)
+    return TestClient(app), full_stack_paths
+
+
+def test_get_probe_skips_the_stack():
+    client, full_stack_paths = _make_client()
+
+    response = client.get("/health")
+
+    assert response.status_code == 200
+    assert full_stack_paths == []
+
+
+def test_non_get_probe_gets_405():
+    client, full_stack_paths = _make_client()
+
+    for method in ("HEAD", "POST"):
+        response = client.request(method, "/health")
+        assert response.status_code == 405
+
+    assert full_stack_paths == [("HEAD", "/health"), ("POST", "/health")]
+
+
+def test_cross_origin_probe_goes_through_the_stack():
+    client, full_stack_paths = _make_client()
+
+    response = client.get("/health", headers={"Origin": "http://example.com"})
+
+    assert response.status_code == 200
+    assert full_stack_paths == [("GET", "/health")]
+
+
+def test_probe_http_exception_uses_the_app_handlers():
+    client, full_stack_paths = _make_client()
+
+    # Raised inside the bypass: handled like anywhere else, not a bare 500
+    response = client.get("/health/detailed")
+
+    assert response.status_code == 503
+    assert response.json() == {"detail": "degraded"}
+    assert full_stack_paths == []